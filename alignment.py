@@ -0,0 +1,221 @@
+# alignment.py — align the camera/mic angles of one session and keep the clearest one per window
+#
+# Every angle records the same conversation, so instead of transcribing each of them we:
+#   1. decode each file once into a 10 ms energy envelope (a few MB even for an hour);
+#   2. find each angle's start on a common timeline by FFT cross-correlation of the envelopes
+#      against the first angle (log energy, z-scored, lag limited to ALIGN_MAX_LAG_S);
+#   3. per ALIGN_WINDOW_S window pick the angle with the best SNR (window level over that angle's
+#      noise floor), switching only when another angle is ALIGN_SWITCH_DB better;
+#   4. decode all angles again in lock-step and emit only the chosen windows as one PCM stream
+#      on the common timeline, which the usual segmenter (VAD, chunking) and STT then consume.
+# The timeline starts with the earliest recording, so timestamps agree across angles.
+# If any angle correlates worse than ALIGN_MIN_SCORE the alignment is marked unreliable and the
+# callers fall back to transcribing every angle.
+
+import os
+from typing import Iterator, List, Optional, Sequence
+
+from result_cache import cached, file_digest
+from audio_stream import (CHUNK_LENGTH_S, SAMPLE_RATE, SAMPLE_WIDTH, VAD_ENABLED, AudioChunk, SegmentStats,
+                          chunks_for, stream_pcm)
+
+ENVELOPE_HZ = 100                                   # envelope frames per second (10 ms)
+ALIGN_MAX_LAG_S = float(os.environ.get("ALIGN_MAX_LAG_S", "300"))
+ALIGN_WINDOW_S = float(os.environ.get("ALIGN_WINDOW_S", "2"))
+ALIGN_SWITCH_DB = 3.0                               # hysteresis between angles
+ALIGN_MIN_SCORE = float(os.environ.get("ALIGN_MIN_SCORE", "0.45"))  # correlation below this = not the same recording
+ALIGN_MIN_OVERLAP_S = 30.0                          # lags with less common audio are not considered
+NOISE_PERCENTILE = 10                               # an angle's noise floor: this percentile of its frames
+
+_FRAME_BYTES = SAMPLE_RATE * SAMPLE_WIDTH // ENVELOPE_HZ
+_BLOCK_BYTES = _FRAME_BYTES * ENVELOPE_HZ * 30      # 30 s, a whole number of VAD frames too
+
+
+class Alignment:
+    """Offsets of every angle on the common timeline and the angle chosen per window."""
+
+    __slots__ = ("offsets_s", "scores", "durations_s", "window_s", "choice")
+
+    def __init__(self, offsets_s, scores, durations_s, window_s, choice):
+        self.offsets_s: List[float] = offsets_s      # where each angle's t=0 falls on the timeline
+        self.scores: List[float] = scores            # correlation with angle 0 (1.0 for angle 0)
+        self.durations_s: List[float] = durations_s
+        self.window_s: float = window_s
+        self.choice: List[int] = choice              # angle index per window (-1: nothing recorded)
+
+    @property
+    def reliable(self) -> bool:
+        return all(s >= ALIGN_MIN_SCORE for s in self.scores)
+
+    @property
+    def duration_s(self) -> float:
+        return max(o + d for o, d in zip(self.offsets_s, self.durations_s))
+
+    def shares(self) -> List[float]:
+        """Fraction of the windows taken from each angle."""
+        n = max(1, len(self.choice))
+        return [sum(1 for c in self.choice if c == a) / n for a in range(len(self.offsets_s))]
+
+    def summary(self) -> str:
+        offsets = ", ".join(f"{o:+.2f} s" for o in self.offsets_s)
+        shares = " / ".join(f"{100 * s:.0f}%" for s in self.shares())
+        scores = ", ".join(f"{s:.2f}" for s in self.scores[1:]) or "-"
+        return f"angle offsets {offsets}; audio taken {shares}; match r={scores}"
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Alignment":
+        return cls(**d)
+
+
+def envelope(path: str):
+    """Frame RMS level (dBFS) every 10 ms, from one decode of `path`."""
+    import numpy as np
+    parts = []
+    for block in stream_pcm(path, _BLOCK_BYTES):
+        samples = np.frombuffer(block, dtype=np.int16).astype(np.float32)
+        n = len(samples) // (_FRAME_BYTES // SAMPLE_WIDTH)
+        if n:
+            frames = samples[: n * (_FRAME_BYTES // SAMPLE_WIDTH)].reshape(n, -1)
+            rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+            parts.append(20.0 * np.log10(np.maximum(rms, 1e-6)))
+    return np.concatenate(parts).astype(np.float32) if parts else np.zeros(0, dtype=np.float32)
+
+
+def estimate_lag(ref_db, db, max_lag_frames: int, min_overlap_frames: int):
+    """
+    (lag, score): `db` frame t lines up with `ref_db` frame t + lag. Score is the correlation of
+    the z-scored envelopes over their overlap (about 1 for the same audio, about 0 for unrelated).
+    """
+    import numpy as np
+    a = (ref_db - ref_db.mean()) / (ref_db.std() + 1e-6)
+    b = (db - db.mean()) / (db.std() + 1e-6)
+    nfft = 1 << (len(a) + len(b) - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(a, nfft) * np.conj(np.fft.rfft(b, nfft)), nfft)
+    lags = np.arange(-(len(b) - 1), len(a))
+    vals = np.concatenate([corr[nfft - (len(b) - 1):], corr[:len(a)]]) if len(b) > 1 else corr[:len(a)]
+    overlap = np.minimum(len(a), lags + len(b)) - np.maximum(0, lags)
+    ok = (np.abs(lags) <= max_lag_frames) & (overlap >= min(min_overlap_frames, len(a), len(b)))
+    if not ok.any():
+        return 0, 0.0
+    r = np.where(ok, vals / np.maximum(overlap, 1), -np.inf)
+    k = int(np.argmax(r))
+    return int(lags[k]), float(r[k])
+
+
+def _choose(envs, starts, window_frames: int, total_frames: int) -> List[int]:
+    """Angle with the best SNR per window (on the timeline), with ALIGN_SWITCH_DB hysteresis."""
+    import numpy as np
+    floors = [float(np.percentile(e, NOISE_PERCENTILE)) if len(e) else 0.0 for e in envs]
+    choice, current = [], -1
+    for w0 in range(0, total_frames, window_frames):
+        snr = {}
+        for a, (e, start) in enumerate(zip(envs, starts)):
+            seg = e[max(0, w0 - start):max(0, w0 + window_frames - start)]
+            if len(seg):
+                level = 10.0 * np.log10(np.mean(10.0 ** (seg / 10.0)))
+                snr[a] = level - floors[a]
+        if not snr:
+            choice.append(-1)
+            continue
+        best = max(snr, key=snr.get)
+        if current not in snr or snr[best] > snr[current] + ALIGN_SWITCH_DB:
+            current = best
+        choice.append(current)
+    return choice
+
+
+def align(paths: Sequence[str], window_s: float = ALIGN_WINDOW_S, max_lag_s: float = ALIGN_MAX_LAG_S) -> Alignment:
+    """Offsets (from the audio itself) and per-window angle choice for the files of one session."""
+    envs = [envelope(p) for p in paths]
+    lags, scores = [0], [1.0]
+    for e in envs[1:]:
+        lag, score = estimate_lag(envs[0], e, int(max_lag_s * ENVELOPE_HZ), int(ALIGN_MIN_OVERLAP_S * ENVELOPE_HZ))
+        lags.append(lag)
+        scores.append(score)
+    first = min(lags)
+    starts = [lag - first for lag in lags]  # timeline frames; the earliest recording starts at 0
+    total = max(s + len(e) for s, e in zip(starts, envs)) if envs else 0
+    window_frames = max(1, int(round(window_s * ENVELOPE_HZ)))
+    return Alignment(
+        offsets_s=[s / ENVELOPE_HZ for s in starts],
+        scores=scores,
+        durations_s=[len(e) / ENVELOPE_HZ for e in envs],
+        window_s=window_frames / ENVELOPE_HZ,
+        choice=_choose(envs, starts, window_frames, total),
+    )
+
+
+def align_session(paths: Sequence[str], window_s: float = ALIGN_WINDOW_S,
+                  max_lag_s: float = ALIGN_MAX_LAG_S) -> Alignment:
+    """align(), cached by the file contents (a cache hit skips decoding the envelopes)."""
+    key = ([file_digest(p) for p in paths], alignment_params(window_s, max_lag_s))
+    return Alignment.from_dict(cached("align", key, lambda: align(paths, window_s, max_lag_s).to_dict()))
+
+
+class _TimelineReader:
+    """One angle's PCM on the common timeline: silence before its start and after its end."""
+
+    def __init__(self, path: str, start_bytes: int):
+        self._blocks = stream_pcm(path, _BLOCK_BYTES)
+        self._lead = start_bytes
+        self._buf = bytearray()
+        self._eof = False
+
+    def read(self, n: int) -> bytes:
+        out = bytearray()
+        if self._lead:
+            take = min(n, self._lead)
+            out += bytes(take)
+            self._lead -= take
+        while len(out) + len(self._buf) < n and not self._eof:
+            block = next(self._blocks, None)
+            if block is None:
+                self._eof = True
+            else:
+                self._buf += block
+        take = min(n - len(out), len(self._buf))
+        out += self._buf[:take]
+        del self._buf[:take]
+        out += bytes(n - len(out))
+        return bytes(out)
+
+    def close(self):
+        self._blocks.close()
+
+
+def aligned_pcm(paths: Sequence[str], alignment: Alignment) -> Iterator[bytes]:
+    """The chosen window of every angle, back to back on the timeline, as 30 s PCM blocks."""
+    window_bytes = int(round(alignment.window_s * ENVELOPE_HZ)) * _FRAME_BYTES
+    readers = [_TimelineReader(p, int(round(o * ENVELOPE_HZ)) * _FRAME_BYTES)
+               for p, o in zip(paths, alignment.offsets_s)]
+    out = bytearray()
+    try:
+        for a in alignment.choice:
+            # every angle advances in lock-step; only the chosen one is kept
+            windows = [r.read(window_bytes) for r in readers]
+            out += windows[a] if a >= 0 else bytes(window_bytes)
+            if len(out) >= _BLOCK_BYTES:
+                yield bytes(out[:_BLOCK_BYTES])
+                del out[:_BLOCK_BYTES]
+        if out:
+            yield bytes(out)
+    finally:
+        for r in readers:
+            r.close()
+
+
+def session_chunks(paths: Sequence[str], alignment: Alignment, vad: bool = VAD_ENABLED,
+                   stats: Optional[SegmentStats] = None,
+                   chunk_length_s: int = CHUNK_LENGTH_S) -> Iterator[AudioChunk]:
+    """AudioChunks of the aligned single-channel stream; offsets are on the common timeline."""
+    return chunks_for(None, vad=vad, stats=stats, chunk_length_s=chunk_length_s,
+                      blocks=aligned_pcm(paths, alignment))
+
+
+def alignment_params(window_s: float = ALIGN_WINDOW_S, max_lag_s: float = ALIGN_MAX_LAG_S) -> dict:
+    """Everything about alignment that changes what gets transcribed (part of result-cache keys)."""
+    return {"window_s": window_s, "max_lag_s": max_lag_s, "switch_db": ALIGN_SWITCH_DB,
+            "noise_percentile": NOISE_PERCENTILE, "envelope_hz": ENVELOPE_HZ}
@@ -2,69 +2,50 @@
 import streamlit as st
 from pathlib import Path
 # Text models utilities (updated to GPT-4o)
-from gpt_utils import combine_transcripts_with_gpt, assess_transcript_quality
-import os, tempfile, subprocess
-# Optional local pipeline (keep if you still want it)
-try:
-    from pipeline import pipeline_for_video  # your existing local Whisper path
-except Exception:
-    pipeline_for_video = None
-from typing import List, Tuple
-# ------------- OpenAI STT (forced to gpt-4o-transcribe) -------------
-def _openai_client(api_key: str):
-    from openai import OpenAI
-    return OpenAI(api_key=api_key)
-
-def transcribe_with_openai_single(file_path: str, api_key: str) -> str:
-    client = _openai_client(api_key)
-    with open(file_path, "rb") as f:
-        resp = client.audio.transcriptions.create(
-            model="gpt-4o-transcribe",   # forced (no mini)
-            file=f,
-            response_format="text",
-        )
-    return str(resp)
-
-def extract_audio_ffmpeg(video_path: str) -> str:
-    out_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-    import subprocess
-    cmd = ["ffmpeg", "-y", "-i", video_path, "-ac", "1", "-ar", "16000", out_wav]
-    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return out_wav
-
-def split_audio(audio_path: str, chunk_len_ms: int = 5 * 60 * 1000) -> List[Tuple[str, int]]:
-    from pydub import AudioSegment
-    audio = AudioSegment.from_file(audio_path)
-    chunks: List[Tuple[str, int]] = []
-    for i in range(0, len(audio), chunk_len_ms):
-        segment = audio[i:i+chunk_len_ms]
-        fp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-        segment.export(fp, format="wav")
-        chunks.append((fp, i // 1000))
-    return chunks
-
-def transcribe_long_with_openai(video_path: str, api_key: str) -> List[str]:
-    def _fmt_time(seconds: int) -> str:
-        h = seconds // 3600
-        m = (seconds % 3600) // 60
-        s = seconds % 60
-        return f"{h:02d}:{m:02d}:{s:02d}"
-    audio_path = extract_audio_ffmpeg(video_path)
-    try:
-        chunks = split_audio(audio_path)
-        lines: List[str] = []
-        for chunk_path, start_sec in chunks:
-            try:
-                txt = transcribe_with_openai_single(chunk_path, api_key)
-                for sent in [s.strip() for s in txt.replace("\r"," ").split("\n") if s.strip()]:
-                    lines.append(f"[{_fmt_time(start_sec)}] {sent}")
-            finally:
-                try: os.remove(chunk_path)
-                except Exception: pass
-        return lines
-    finally:
-        try: os.remove(audio_path)
-        except Exception: pass
+from gpt_utils import (normalize_assessment, stream_assess_transcript_quality, stream_combine_transcripts,
+                       stream_combine_transcripts_windowed)
+import os, tempfile, time
+# Local engines (pipeline.py) are imported only when selected: torch/whisper are not loaded for the API engine
+from stt_backends import available, import_times, load_backend
+# OpenAI STT (forced to gpt-4o-transcribe); chunks are transcribed concurrently
+from openai_stt import transcribe_long_with_openai, transcribe_session_with_openai
+# multi-angle sessions can be aligned and transcribed once
+from alignment import align_session
+# all uploads of a session are processed concurrently
+from scheduler import run_session
+from audio_stream import VAD_ENABLED, SegmentStats
+from result_cache import get_cache, recording
+from windowed_merge import MERGE_WINDOW_S
+# per-run timing / token / cost spans (NEE_TRACE=0 turns them off)
+import json
+import tracing
+
+# Optional: preload the local Whisper weights once per process (WHISPER_WARMUP=1 or a model name)
+_warmup = os.environ.get("WHISPER_WARMUP", "")
+if _warmup and _warmup != "0" and available("openai-whisper"):
+    load_backend("openai-whisper")
+    from pipeline import warm_up_whisper
+    if _warmup == "1":
+        warm_up_whisper()
+    else:
+        warm_up_whisper(_warmup)
+
+
+def _show_stream(slot, pieces, lines: bool = True, every_s: float = 0.2) -> str:
+    """Render streamed text into an st.empty() slot (whole lines, at most every `every_s`); return it all."""
+    text, shown, last = "", 0, 0.0
+    for piece in pieces:
+        text += piece
+        cut = text.rfind("\n") if lines else len(text)
+        if cut > shown and time.monotonic() - last >= every_s:
+            slot.text(text[:cut])
+            shown, last = cut, time.monotonic()
+    return text
+
+def _keep_trace(trace, keep: int = 10):
+    """Remember the last few run traces for the sidebar breakdown."""
+    if trace is not None:
+        st.session_state["traces"] = (st.session_state.get("traces", []) + [trace.to_dict()])[-keep:]
 
 # ------------------------- UI -------------------------
 st.set_page_config(page_title="Nursing Simulation: Transcribe & Assess", layout="wide")
@@ -85,11 +66,47 @@ st.sidebar.header("Settings")
 api_key = st.sidebar.text_input("OpenAI API Key", type="password")
 
 # Keep engine toggle if you still want local option; default to OpenAI
+# engine label -> local backend in stt_backends.py (None: OpenAI API)
+ENGINES = {
+    "OpenAI API (gpt-4o-transcribe)": None,
+    "Local Whisper (requires GPU)": "openai-whisper",
+    "Local faster-whisper (CPU, int8)": "faster-whisper",
+}
 engine = st.sidebar.radio(
     "Transcription engine",
-    ["OpenAI API (gpt-4o-transcribe)", "Local Whisper (requires GPU)"],
+    list(ENGINES),
     index=0
 )
+backend = ENGINES[engine]
+
+if st.sidebar.button(
+    "Clear this session's cached results",
+    help="Transcripts, merges and assessments are cached by content. Only the entries this browser session "
+         "used are removed; `python result_cache.py clear` empties the whole cache.",
+):
+    n = get_cache().remove(st.session_state.get("cache_keys", set()))
+    st.session_state["cache_keys"] = set()
+    st.sidebar.success(f"Removed {n} cached result(s).")
+
+skip_silence = st.sidebar.checkbox(
+    "Skip silence before transcription (VAD)", value=VAD_ENABLED,
+    help="Long pauses are cut out before the audio is sent for transcription; timestamps stay the same.",
+)
+
+premerge = st.sidebar.checkbox(
+    "Pre-merge angles locally before GPT-4o", value=False,
+    help="Interleave the transcripts by time and collapse lines heard by several cameras, so GPT-4o gets a much smaller prompt.",
+)
+
+windowed = st.sidebar.checkbox(
+    "Merge long sessions in time windows", value=False,
+    help=f"Split the session into overlapping {MERGE_WINDOW_S // 60}-minute windows, merge them in parallel and stitch the results (no cut-off output for long simulations).",
+)
+
+align_angles = st.sidebar.checkbox(
+    "Align angles and transcribe once", value=False,
+    help="For several recordings of the same session: line them up by their audio and transcribe only the clearest angle at each moment, instead of every angle in full.",
+)
 
 uploaded = st.file_uploader(
     "Upload one or more simulation video files (MP4/MOV/WEBM/MP3/WAV)",
@@ -104,6 +121,8 @@ if "combined" not in st.session_state:
     st.session_state["combined"] = ""
 if "assessment" not in st.session_state:
     st.session_state["assessment"] = ""
+if "cache_keys" not in st.session_state:
+    st.session_state["cache_keys"] = set()  # (kind, version, key) of the cache entries this session used
 
 col1, col2 = st.columns(2)
 with col1:
@@ -117,48 +136,119 @@ if go_btn:
         st.warning("Please upload at least one file.")
     elif engine.startswith("OpenAI") and not api_key:
         st.warning("Enter your OpenAI API key to use the API engine.")
-    elif engine.startswith("Local") and pipeline_for_video is None:
-        st.error("Local Whisper pipeline is not available.")
+    elif backend is not None and not available(backend):
+        st.error(f"{engine} is not available (its packages are not installed).")
     else:
-        st.session_state["raw_transcripts"] = []
-        progress = st.progress(0)
-        for i, f in enumerate(uploaded, start=1):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(f.name).suffix) as tmp:
-                tmp.write(f.getbuffer())
-                tmp_path = tmp.name
-            st.write(f"**Processing:** {f.name}")
-            try:
-                if engine.startswith("OpenAI"):
-                    with st.spinner("Transcribing with OpenAI (gpt-4o-transcribe)..."):
-                        lines = transcribe_long_with_openai(tmp_path, api_key)
+        with tracing.session("transcribe") as trace, recording(st.session_state["cache_keys"]):
+            st.session_state["raw_transcripts"] = []
+            use_openai = backend is None
+            if not use_openai:
+                with st.spinner(f"Loading {backend}..."):
+                    load_backend(backend)  # first use in this process imports torch / ctranslate2
+                from pipeline import pipeline_for_session, pipeline_for_video
+
+            def _transcribe_upload(tmp_path: str):
+                stats = SegmentStats()
+                if use_openai:
+                    lines = transcribe_long_with_openai(tmp_path, api_key, vad=skip_silence, stats=stats)
                 else:
-                    with st.spinner("Transcribing locally with Whisper (small)..."):
-                        lines = pipeline_for_video(tmp_path)
-                transcript_text = "\n".join(lines) if isinstance(lines, list) else str(lines)
-                st.session_state["raw_transcripts"].append(transcript_text)
-                st.success(f"Finished: {f.name}")
-            except Exception as e:
-                st.error(f"Failed on {f.name}: {e}")
+                    lines = pipeline_for_video(tmp_path, vad=skip_silence, stats=stats, backend=backend)
+                return lines, stats
+
+            # write every upload to disk first, then extract + transcribe all of them at once
+            tmp_paths = []
+            progress = st.progress(0)
+            status = [st.empty() for _ in uploaded]
+            for f, slot in zip(uploaded, status):
+                slot.write(f"**Processing:** {f.name}")
+            results = [None] * len(uploaded)
+            done = 0
+            spinner_msg = ("Transcribing with OpenAI (gpt-4o-transcribe)..." if use_openai
+                           else f"Transcribing locally with {backend}...")
+            try:
+                for f in uploaded:
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(f.name).suffix) as tmp:
+                        tmp.write(f.getbuffer())
+                        tmp_paths.append(tmp.name)
+
+                alignment = None
+                if align_angles and len(tmp_paths) > 1:
+                    try:
+                        with st.spinner("Aligning camera angles..."):
+                            alignment = align_session(tmp_paths)
+                    except Exception as e:
+                        # e.g. one angle without a readable audio stream: the per-angle path reports it per file
+                        st.warning(f"The angles could not be aligned ({e}); transcribing each one.")
+                    else:
+                        if not alignment.reliable:
+                            st.warning(f"The angles could not be aligned ({alignment.summary()}); "
+                                       "transcribing each one.")
+                            alignment = None
+
+                if alignment is not None:
+                    # one transcript on the common timeline instead of one per angle
+                    stats = SegmentStats()
+                    try:
+                        with st.spinner(spinner_msg):
+                            if use_openai:
+                                lines = transcribe_session_with_openai(tmp_paths, alignment, api_key,
+                                                                       vad=skip_silence, stats=stats)
+                            else:
+                                lines = pipeline_for_session(tmp_paths, alignment, vad=skip_silence, stats=stats,
+                                                             backend=backend)
+                    except Exception as e:
+                        st.warning(f"Transcribing the aligned angles failed ({e}); transcribing each one.")
+                        alignment = None
+                    else:
+                        results = ["\n".join(lines)]
+                        note = " (from cache)" if not stats.total_s else (f"; {stats.summary()}" if skip_silence else "")
+                        status[0].success(f"Finished {len(uploaded)} angles as one: {alignment.summary()}{note}")
+                        for slot in status[1:]:
+                            slot.empty()
+                        progress.progress(1.0)
+
+                if alignment is None:
+                    with st.spinner(spinner_msg):
+                        for i, res, err in run_session(tmp_paths, _transcribe_upload):
+                            name = uploaded[i].name
+                            if err is not None:
+                                status[i].error(f"Failed on {name}: {err}")
+                            else:
+                                lines, stats = res
+                                results[i] = "\n".join(lines) if isinstance(lines, list) else str(lines)
+                                if not stats.total_s:
+                                    note = " (from cache)"
+                                else:
+                                    note = f" ({stats.summary()})" if skip_silence else ""
+                                status[i].success(f"Finished: {name}{note}")
+                            done += 1
+                            progress.progress(done / len(uploaded))
             finally:
-                try: os.remove(tmp_path)
-                except Exception: pass
-            progress.progress(i / len(uploaded))
-
-        # AUTO-COMBINE with GPT-4o (no raw transcript shown)
-        if not api_key:
-            st.warning("OpenAI API key is required to combine transcripts.")
-        else:
-            with st.spinner("Combining transcripts with GPT-4o..."):
-                st.session_state["combined"] = combine_transcripts_with_gpt(
-                    st.session_state["raw_transcripts"], api_key
+                for tmp_path in tmp_paths:
+                    try: os.remove(tmp_path)
+                    except Exception: pass
+            # keep upload order for the merge
+            st.session_state["raw_transcripts"] = [t for t in results if t is not None]
+
+            # AUTO-COMBINE with GPT-4o (no raw transcript shown)
+            if not api_key:
+                st.warning("OpenAI API key is required to combine transcripts.")
+            else:
+                st.subheader("📝 Combined Transcript")
+                slot = st.empty()
+                with st.spinner("Combining transcripts with GPT-4o..."):
+                    # lines appear as GPT-4o writes them; the final text is the same as the blocking call
+                    stream = stream_combine_transcripts_windowed if windowed else stream_combine_transcripts
+                    st.session_state["combined"] = _show_stream(
+                        slot, stream(st.session_state["raw_transcripts"], api_key, premerge=premerge)
+                    ).strip()
+                slot.text_area("Combined", st.session_state["combined"], height=300)
+                st.download_button(
+                    "Download combined transcript",
+                    st.session_state["combined"].encode("utf-8"),
+                    file_name="combined_transcript.txt",
                 )
-            st.subheader("📝 Combined Transcript")
-            st.text_area("Combined", st.session_state["combined"], height=300)
-            st.download_button(
-                "Download combined transcript",
-                st.session_state["combined"].encode("utf-8"),
-                file_name="combined_transcript.txt",
-            )
+        _keep_trace(trace)
 
 # --------- Assess (uses GPT-4o) ----------
 if assess_btn:
@@ -167,9 +257,34 @@ if assess_btn:
     elif not api_key:
         st.warning("Enter your OpenAI API key.")
     else:
-        with st.spinner("Assessing empathy with GPT-4o..."):
-            st.session_state["assessment"] = assess_transcript_quality(
-                st.session_state["combined"], api_key
+        with tracing.session("assess") as trace, recording(st.session_state["cache_keys"]):
+            st.subheader("📊 Empathy Assessment")
+            slot = st.empty()
+            with st.spinner("Assessing empathy with GPT-4o..."):
+                pieces = stream_assess_transcript_quality(st.session_state["combined"], api_key)
+                st.session_state["assessment"] = normalize_assessment(
+                    _show_stream(slot, pieces, lines=False, every_s=0.1)
+                )
+            slot.write(st.session_state["assessment"])
+        _keep_trace(trace)
+
+# --------- Timing & cost (sidebar) ----------
+if import_times():
+    st.sidebar.caption("Engine import: " + ", ".join(f"{k} {v:.1f} s" for k, v in import_times().items()))
+if st.session_state.get("traces"):
+    with st.sidebar.expander("Timing & cost (last runs)"):
+        for t in reversed(st.session_state["traces"]):
+            st.markdown(f"**{t['session']}** · {t['started'][11:]} · {t['wall_s']:.1f} s wall · ${t['cost_usd']:.4f}")
+            st.dataframe(
+                [{"stage": name, "calls": row["calls"], "seconds": round(row["seconds"], 2),
+                  "audio s": round(row.get("audio_s", 0), 1), "MB": round(row.get("bytes", 0) / 1e6, 2),
+                  "tokens in": row.get("prompt_tokens", 0), "tokens out": row.get("completion_tokens", 0),
+                  "$": round(row.get("cost_usd", 0), 4)}
+                 for name, row in t["stages"].items()],
+                hide_index=True,
             )
-        st.subheader("📊 Empathy Assessment")
-        st.write(st.session_state["assessment"])
\ No newline at end of file
+        st.download_button(
+            "Download traces (JSON)",
+            json.dumps(st.session_state["traces"], ensure_ascii=False, indent=2).encode("utf-8"),
+            file_name="traces.json",
+        )
@@ -0,0 +1,354 @@
+# audio_stream.py — single-pass audio segmenter shared by the OpenAI and local Whisper paths
+#
+# One ffmpeg process decodes the input straight to 16 kHz mono PCM on stdout; we cut that
+# stream into chunks held in memory. No intermediate MP3/WAV files, no re-encoding, and
+# peak memory is bounded by the chunk size rather than the recording length.
+#
+# speech_chunks() additionally drops long silences (energy VAD) and puts chunk boundaries
+# in pauses; every chunk keeps a map back to the original timeline so timestamps stay right.
+
+import io
+import os
+import subprocess
+import wave
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import tracing
+
+SAMPLE_RATE = 16000     # what Whisper / gpt-4o-transcribe want anyway
+SAMPLE_WIDTH = 2        # s16le
+CHUNK_LENGTH_S = 5 * 60  # 5 minutes
+
+# --- VAD settings (override per call or via env) ---
+VAD_ENABLED = os.environ.get("STT_VAD", "1") != "0"
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", "-45"))  # frame RMS (dBFS) counted as speech
+VAD_MIN_SILENCE_MS = int(os.environ.get("VAD_MIN_SILENCE_MS", "1500"))  # shorter pauses are kept
+VAD_PAD_MS = 300            # audio kept on each side of a dropped silence
+VAD_FRAME_MS = 30
+VAD_BOUNDARY_MS = 200       # unvoiced run long enough to cut a chunk in
+
+
+class AudioChunk:
+    """
+    A slice of decoded mono PCM plus where it came from in the original recording.
+    `spans` is a sorted list of (chunk_seconds, original_seconds) breakpoints: audio between two
+    breakpoints is contiguous in the original, silence removed by VAD sits between them.
+    """
+
+    __slots__ = ("pcm", "offset", "spans")
+
+    def __init__(self, pcm: bytes, offset: float, spans: Optional[List[Tuple[float, float]]] = None):
+        self.pcm = pcm
+        self.offset = offset
+        self.spans = spans or [(0.0, offset)]
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+    def to_original(self, t: float) -> float:
+        """Map a time inside this chunk (e.g. a Whisper segment start) to the original recording."""
+        i = max(0, bisect_right(self.spans, (t, float("inf"))) - 1)
+        chunk_s, orig_s = self.spans[i]
+        return orig_s + (t - chunk_s)
+
+    def as_wav(self, name: str = "chunk.wav") -> io.BytesIO:
+        """In-memory WAV file (with a .name, so the OpenAI SDK can upload it directly)."""
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(SAMPLE_WIDTH)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(self.pcm)
+        buf.seek(0)
+        buf.name = name
+        return buf
+
+    def as_array(self):
+        """float32 samples in [-1, 1] — what whisper's model.transcribe() accepts instead of a path."""
+        import numpy as np
+        return np.frombuffer(self.pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class SegmentStats:
+    """Filled in by the segmenters: how much audio was read and how much was dropped as silence."""
+
+    __slots__ = ("total_s", "kept_s", "chunks")
+
+    def __init__(self):
+        self.total_s = 0.0
+        self.kept_s = 0.0
+        self.chunks = 0
+
+    @property
+    def removed_s(self) -> float:
+        return max(0.0, self.total_s - self.kept_s)
+
+    def summary(self) -> str:
+        pct = 100.0 * self.removed_s / self.total_s if self.total_s else 0.0
+        return (f"skipped {self.removed_s / 60:.1f} of {self.total_s / 60:.1f} min as silence "
+                f"({pct:.0f}%), {self.chunks} chunk(s)")
+
+
+def _ffmpeg_pcm_cmd(path: str):
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+
+
+def stream_pcm(path: str, block_bytes: int) -> Iterator[bytes]:
+    """Yield raw PCM blocks of block_bytes (the last one may be shorter) from a single ffmpeg process."""
+    proc = subprocess.Popen(_ffmpeg_pcm_cmd(path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            block = proc.stdout.read(block_bytes)
+            if not block:
+                break
+            yield block
+        stderr = proc.stderr.read().decode("utf-8", "replace")
+        if proc.wait() != 0:
+            raise RuntimeError(f"Audio extraction failed.\n\nffmpeg stderr:\n{stderr}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def reblock(blocks: Iterable[bytes], block_bytes: int) -> Iterator[bytes]:
+    """Re-cut a PCM block stream into blocks of block_bytes (the last one may be shorter)."""
+    buf = bytearray()
+    for block in blocks:
+        buf += block
+        while len(buf) >= block_bytes:
+            yield bytes(buf[:block_bytes])
+            del buf[:block_bytes]
+    if buf:
+        yield bytes(buf)
+
+
+def iter_chunks(path: str, chunk_length_s: int = CHUNK_LENGTH_S, blocks: Optional[Iterable[bytes]] = None,
+                stats: Optional[SegmentStats] = None) -> Iterator[AudioChunk]:
+    """
+    Decode `path` once (or take PCM `blocks`) and yield consecutive AudioChunks of chunk_length_s seconds.
+    A SegmentStats gets the totals (nothing is dropped, so kept == total).
+    """
+    chunk_bytes = chunk_length_s * SAMPLE_RATE * SAMPLE_WIDTH
+    offset = 0
+    source = stream_pcm(path, chunk_bytes) if blocks is None else reblock(blocks, chunk_bytes)
+    for pcm in source:
+        chunk = AudioChunk(pcm, offset)
+        if stats is not None:
+            stats.total_s += chunk.duration
+            stats.kept_s += chunk.duration
+            stats.chunks += 1
+        yield chunk
+        offset += chunk_length_s
+
+
+def _frame_db(block: bytes, frame_bytes: int):
+    """RMS level (dBFS) of every frame in a PCM block (the block is a whole number of frames, except at EOF)."""
+    import numpy as np
+    samples = np.frombuffer(block, dtype=np.int16).astype(np.float32)
+    n = len(samples) // (frame_bytes // SAMPLE_WIDTH)
+    out = np.full(n + (1 if len(samples) % (frame_bytes // SAMPLE_WIDTH) else 0), -120.0, dtype=np.float32)
+    if n:
+        frames = samples[: n * (frame_bytes // SAMPLE_WIDTH)].reshape(n, -1)
+        rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+        out[:n] = 20.0 * np.log10(np.maximum(rms, 1e-6))
+    if len(out) > n:
+        tail = samples[n * (frame_bytes // SAMPLE_WIDTH):]
+        out[n] = 20.0 * np.log10(max(float(np.sqrt(np.mean(tail * tail))) / 32768.0, 1e-6))
+    return out
+
+
+class _ChunkBuilder:
+    """Accumulates kept audio for one chunk and remembers the last pause to cut at."""
+
+    def __init__(self):
+        self.pcm = bytearray()
+        self.spans: List[Tuple[int, int]] = []   # (chunk_byte, original_byte)
+        self.cut_at: Optional[int] = None        # chunk byte index of the last usable pause
+
+    def append(self, data: bytes, orig_byte: int):
+        """Append audio that starts at orig_byte in the original; opens a new span on discontinuity."""
+        if not data:
+            return
+        if not self.pcm:
+            self.spans = [(0, orig_byte)]
+        else:
+            c0, o0 = self.spans[-1]
+            if o0 + (len(self.pcm) - c0) != orig_byte:
+                self.spans.append((len(self.pcm), orig_byte))
+        self.pcm += data
+
+    def split(self, at: int) -> Tuple[AudioChunk, "_ChunkBuilder"]:
+        """Emit pcm[:at] as an AudioChunk, return a builder holding the rest."""
+        bps = SAMPLE_RATE * SAMPLE_WIDTH
+        head = [(c, o) for c, o in self.spans if c < at]
+        rest = _ChunkBuilder()
+        tail_spans = [(c, o) for c, o in self.spans if c >= at]
+        c0, o0 = head[-1]
+        if not tail_spans or tail_spans[0][0] != at:
+            tail_spans.insert(0, (at, o0 + (at - c0)))
+        rest.pcm = bytearray(self.pcm[at:])
+        rest.spans = [(c - at, o) for c, o in tail_spans]
+        chunk = AudioChunk(bytes(self.pcm[:at]), head[0][1] / bps, [(c / bps, o / bps) for c, o in head])
+        return chunk, rest
+
+    def finish(self) -> AudioChunk:
+        return self.split(len(self.pcm))[0]
+
+
+class _SilenceRun:
+    """
+    A pending unvoiced run: stored whole while it is at most `limit` bytes, after that only its first
+    and last `pad` bytes (a rolling tail) and its length, so a long silence costs O(pad) memory.
+    """
+
+    def __init__(self, pad: int, limit: int):
+        self.pad = pad
+        self.limit = limit           # >= the longest short pause and >= 2 * pad
+        self.head = bytearray()      # the whole run, or its first pad bytes once truncated
+        self.tail = bytearray()      # last pad bytes once truncated
+        self.length = 0
+        self.truncated = False
+
+    def add(self, frame: bytes):
+        self.length += len(frame)
+        if not self.truncated:
+            self.head += frame
+            if self.length <= self.limit:
+                return
+            self.truncated = True
+            self.tail = self.head[len(self.head) - self.pad:] if self.pad else bytearray()
+            del self.head[self.pad:]
+            return
+        if self.pad:
+            self.tail += frame
+            if len(self.tail) > self.pad:
+                del self.tail[:len(self.tail) - self.pad]
+
+    def first(self, n: int) -> bytes:
+        return bytes(self.head[:n])
+
+    def last(self, n: int) -> bytes:
+        """The last n (<= pad) bytes; b"" for n == 0."""
+        if not n:
+            return b""
+        return bytes((self.tail if self.truncated else self.head)[-n:])
+
+    def whole(self) -> bytes:
+        assert not self.truncated, "a run longer than the limit is never kept whole"
+        return bytes(self.head)
+
+
+def speech_chunks(
+    path: str,
+    chunk_length_s: int = CHUNK_LENGTH_S,
+    threshold_db: float = VAD_THRESHOLD_DB,
+    min_silence_ms: int = VAD_MIN_SILENCE_MS,
+    pad_ms: int = VAD_PAD_MS,
+    stats: Optional[SegmentStats] = None,
+    blocks: Optional[Iterable[bytes]] = None,
+) -> Iterator[AudioChunk]:
+    """
+    Like iter_chunks(), but silences longer than min_silence_ms are cut out (keeping pad_ms on each
+    side) and a full chunk is cut at its last pause instead of mid-word. Chunk offsets and
+    AudioChunk.to_original() refer to the original recording. Pass a SegmentStats to get totals.
+    `blocks` segments already decoded PCM (whole VAD frames per block) instead of decoding `path`.
+    """
+    stats = stats if stats is not None else SegmentStats()
+    frame_bytes = SAMPLE_RATE * SAMPLE_WIDTH * VAD_FRAME_MS // 1000
+    max_bytes = chunk_length_s * SAMPLE_RATE * SAMPLE_WIDTH
+    min_sil = max(1, min_silence_ms // VAD_FRAME_MS)
+    pad = pad_ms // VAD_FRAME_MS * frame_bytes
+    boundary = max(1, VAD_BOUNDARY_MS // VAD_FRAME_MS)
+    bps = SAMPLE_RATE * SAMPLE_WIDTH
+
+    cur = _ChunkBuilder()
+    # unvoiced frames since the last voiced one: a short pause is kept whole, a long one only needs
+    # its pads and length, so the run is stored in full only up to the longest short pause
+    silence = _SilenceRun(pad, max(min_sil * frame_bytes, 2 * pad))
+    silence_start = 0          # original byte where that run started
+    pos = 0                    # original byte position of the next frame
+    seen_voice = False
+
+    def flush_silence(final: bool):
+        # decide what to keep of the pending unvoiced run
+        nonlocal silence
+        n_frames = -(-silence.length // frame_bytes)
+        if n_frames >= min_sil or (final or not seen_voice):
+            # long pause (or leading/trailing silence): keep only the pads next to speech
+            keep_head = silence.first(pad) if seen_voice else b""
+            keep_tail = silence.last(pad) if (not final and silence.length > len(keep_head)) else b""
+            if len(keep_head) + len(keep_tail) > silence.length:
+                keep_tail = silence.whole()[len(keep_head):]
+            cur.append(keep_head, silence_start)
+            if seen_voice and not final:
+                cur.cut_at = len(cur.pcm)
+            cur.append(keep_tail, silence_start + silence.length - len(keep_tail))
+        else:
+            if n_frames >= boundary and seen_voice:
+                cur.cut_at = len(cur.pcm) + silence.length // 2 // SAMPLE_WIDTH * SAMPLE_WIDTH
+            cur.append(silence.whole(), silence_start)
+        silence = _SilenceRun(pad, silence.limit)
+
+    if blocks is None:
+        blocks = stream_pcm(path, frame_bytes * 1000)  # 30 s blocks
+    for block in blocks:
+        levels = _frame_db(block, frame_bytes)
+        for k, db in enumerate(levels):
+            frame = block[k * frame_bytes:(k + 1) * frame_bytes]
+            if db < threshold_db:
+                if not silence.length:
+                    silence_start = pos
+                silence.add(frame)
+            else:
+                if silence:
+                    flush_silence(final=False)
+                seen_voice = True
+                cur.append(frame, pos)
+            pos += len(frame)
+            # chunk full: cut at the last pause if there is one, else right here
+            while len(cur.pcm) >= max_bytes:
+                at = cur.cut_at if cur.cut_at and cur.cut_at <= max_bytes else max_bytes
+                cur.cut_at = None
+                chunk, cur = cur.split(at)
+                stats.kept_s += chunk.duration
+                stats.chunks += 1
+                yield chunk
+        stats.total_s = pos / bps
+    if silence.length:
+        flush_silence(final=True)
+    stats.total_s = pos / bps
+    if cur.pcm:
+        chunk = cur.finish()
+        stats.kept_s += chunk.duration
+        stats.chunks += 1
+        yield chunk
+
+
+def segmenter_params(vad: bool = VAD_ENABLED, chunk_length_s: int = CHUNK_LENGTH_S) -> dict:
+    """Everything about segmentation that changes what gets transcribed (part of result-cache keys)."""
+    params = {"vad": bool(vad), "chunk_length_s": chunk_length_s, "sample_rate": SAMPLE_RATE}
+    if vad:
+        params.update(threshold_db=VAD_THRESHOLD_DB, min_silence_ms=VAD_MIN_SILENCE_MS, pad_ms=VAD_PAD_MS)
+    return params
+
+
+def chunks_for(path: Optional[str], vad: bool = VAD_ENABLED, stats: Optional[SegmentStats] = None,
+               chunk_length_s: int = CHUNK_LENGTH_S, blocks: Optional[Iterable[bytes]] = None) -> Iterator[AudioChunk]:
+    """
+    The segmenter both STT paths use: VAD chunks by default, fixed-length chunks with vad=False.
+    `blocks` (PCM, e.g. alignment.aligned_pcm) is segmented instead of decoding `path`.
+    """
+    if vad:
+        chunks = speech_chunks(path, chunk_length_s=chunk_length_s, stats=stats, blocks=blocks)
+    else:
+        chunks = iter_chunks(path, chunk_length_s=chunk_length_s, blocks=blocks, stats=stats)
+    # decode span per chunk: ffmpeg + VAD time spent producing it (not the time it waits upstream)
+    return tracing.timed_iter("decode", chunks, lambda c: {"bytes": len(c.pcm), "audio_s": c.duration})
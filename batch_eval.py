@@ -0,0 +1,167 @@
+# batch_eval.py — headless cohort run: merge + empathy assessment for every session under data/
+#
+#   python batch_eval.py data/ --out results.jsonl --workers 4
+#   python batch_eval.py data/ --batch-api merge_requests.jsonl          # OpenAI Batch API input file
+#   python batch_eval.py data/ --batch-api assess_requests.jsonl --stage assess
+#   python batch_eval.py data/ --base-url http://127.0.0.1:8000/v1     # e.g. code/fake_openai.py
+#
+# A session is a directory (data/101 ... data/140) holding one `*_transcript.txt` per camera/mic.
+# Results are appended one JSON object per line as each session finishes, so an interrupted run
+# resumes where it stopped: sessions already in --out without an "error" are skipped.
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+import tracing
+from scheduler import run_session
+
+TRANSCRIPT_SUFFIX = "_transcript.txt"
+
+
+def _session_sort_key(name: str):
+    return (0, int(name)) if name.isdigit() else (1, name)
+
+
+def discover_sessions(data_dir: str, only: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """{session_id: [transcript paths, sorted]} for every sub-directory with *_transcript.txt files."""
+    sessions = {}
+    for name in sorted(os.listdir(data_dir), key=_session_sort_key):
+        d = os.path.join(data_dir, name)
+        if not os.path.isdir(d) or (only and name not in only):
+            continue
+        files = sorted(f for f in os.listdir(d) if f.endswith(TRANSCRIPT_SUFFIX))
+        if files:
+            sessions[name] = [os.path.join(d, f) for f in files]
+    return sessions
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def reference_merge(data_dir: str, session_id: str) -> Optional[str]:
+    """The stored GPT-merged transcript data/<id>/<id>.txt, if present."""
+    path = os.path.join(data_dir, session_id, f"{session_id}.txt")
+    return _read(path) if os.path.exists(path) else None
+
+
+def load_results(path: str) -> Dict[str, dict]:
+    """Last record per session_id from an existing results file (missing file -> {})."""
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                done[rec.get("session_id")] = rec
+    return done
+
+
+def evaluate_session(session_id: str, paths: List[str], api_key: str, premerge: bool = False,
+                     windowed: bool = False) -> dict:
+    from gpt_utils import (assess_transcript_quality, combine_transcripts_windowed,
+                           combine_transcripts_with_gpt, parse_empathy_score)
+    transcripts = [_read(p) for p in paths]
+    merge = combine_transcripts_windowed if windowed else combine_transcripts_with_gpt
+    with tracing.session(session_id) as trace:
+        merged = merge(transcripts, api_key, premerge=premerge)
+        assessment = assess_transcript_quality(merged, api_key)
+    rec = {
+        "session_id": session_id,
+        "sources": [os.path.basename(p) for p in paths],
+        "merged": merged,
+        "assessment": assessment,
+        "score": parse_empathy_score(assessment),
+    }
+    if trace is not None:
+        # per-stage totals only; NEE_TRACE_DIR keeps the full span list
+        t = trace.to_dict()
+        rec["trace"] = {k: t[k] for k in ("wall_s", "cost_usd", "stages")}
+    return rec
+
+
+def write_batch_requests(sessions: Dict[str, List[str]], out_path: str, stage: str,
+                         data_dir: str, results: Dict[str, dict], premerge: bool = False) -> int:
+    """
+    Write an OpenAI Batch API input file (one POST /v1/chat/completions per line).
+    stage="merge": one merge request per session; stage="assess": one assessment per session,
+    using the merged transcript from --out results or the stored data/<id>/<id>.txt.
+    """
+    from gpt_utils import assessment_request_body, merge_request_body
+    n = 0
+    with open(out_path, "w", encoding="utf-8") as f:
+        for sid, paths in sessions.items():
+            if stage == "merge":
+                body = merge_request_body([_read(p) for p in paths], premerge=premerge)
+            else:
+                merged = (results.get(sid) or {}).get("merged") or reference_merge(data_dir, sid)
+                if not merged:
+                    print(f"[skip] {sid}: no merged transcript to assess", file=sys.stderr)
+                    continue
+                body = assessment_request_body(merged)
+            req = {"custom_id": f"{stage}-{sid}", "method": "POST", "url": "/v1/chat/completions", "body": body}
+            f.write(json.dumps(req, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Merge + assess every session in a data/ directory.")
+    ap.add_argument("data_dir", nargs="?", default="data")
+    ap.add_argument("--out", default="results.jsonl", help="JSONL results file (appended; used to resume)")
+    ap.add_argument("--workers", type=int, default=4, help="sessions processed in parallel")
+    ap.add_argument("--sessions", nargs="*", help="only these session ids")
+    ap.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""))
+    ap.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. a local stand-in server")
+    ap.add_argument("--premerge", action="store_true", help="interleave/de-duplicate angles locally before the merge")
+    ap.add_argument("--windowed", action="store_true", help="merge in overlapping time windows (long sessions)")
+    ap.add_argument("--force", action="store_true", help="re-run sessions that already have results")
+    ap.add_argument("--batch-api", metavar="PATH", help="write Batch API requests to PATH instead of calling the API")
+    ap.add_argument("--stage", choices=["merge", "assess"], default="merge", help="which requests --batch-api writes")
+    args = ap.parse_args(argv)
+
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    sessions = discover_sessions(args.data_dir, args.sessions)
+    results = load_results(args.out)
+
+    if args.batch_api:
+        n = write_batch_requests(sessions, args.batch_api, args.stage, args.data_dir, results, args.premerge)
+        print(f"wrote {n} {args.stage} request(s) to {args.batch_api}")
+        return 0
+
+    if not args.api_key:
+        ap.error("an OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+    todo = [sid for sid in sessions
+            if args.force or sid not in results or results[sid].get("error")]
+    print(f"{len(sessions)} session(s), {len(sessions) - len(todo)} already done, {len(todo)} to run")
+
+    failed = 0
+    with open(args.out, "a", encoding="utf-8") as out:
+        for i, rec, err in run_session(todo, lambda sid: evaluate_session(sid, sessions[sid], args.api_key,
+                                                                    args.premerge, args.windowed),
+                                       max_workers=args.workers):
+            sid = todo[i]
+            if err is not None:
+                rec = {"session_id": sid, "error": f"{type(err).__name__}: {err}"}
+                failed += 1
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")  # run_session yields in this thread
+            out.flush()
+            status = f"error: {rec['error']}" if err is not None else f"score={rec['score']}"
+            print(f"[{sid}] {status}")
+    from openai_client import stats
+    print("API requests: " + ", ".join(f"{k}={v}" for k, v in stats().items()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# bench_cpu_stt.py — CPU real-time factor of the local STT backends (stt_backends.py)
+#
+#   python code/bench_cpu_stt.py --audio session.mp4 [--seconds 120] [--model large]
+#   python code/bench_cpu_stt.py --backends faster-whisper --threads 4 8 --batch-size 1 8
+#
+# Every backend/setting transcribes the same first --seconds of --audio (VAD chunks, as
+# pipeline_for_video does) on the CPU. Reported: model load time, RTF (processing seconds per
+# audio second, lower is better; 1.0 = real time) and the similarity of each transcript to the
+# first one. Without --audio a synthetic tone track is used: fine for speed, meaningless for text.
+# Backends whose packages are missing are reported as skipped.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from difflib import SequenceMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+os.environ["NEE_CACHE"] = "0"
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")  # CPU only, also for openai-whisper
+
+from audio_stream import SegmentStats, chunks_for  # noqa: E402
+
+
+def _synthetic(seconds: int) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"nee-stt-bench-{seconds}s.wav")
+    if not os.path.exists(path):
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i",
+                        f"sine=frequency=220:duration={seconds}", "-af",
+                        "volume='if(lt(mod(t,9),6),0.5,0)':eval=frame", "-ac", "1", "-ar", "16000", path], check=True)
+    return path
+
+
+def _clip(path: str, seconds: int) -> str:
+    out = os.path.join(tempfile.gettempdir(), f"nee-stt-bench-clip-{seconds}s.wav")
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-i", path, "-t", str(seconds), "-vn", "-ac", "1",
+                    "-ar", "16000", out], check=True)
+    return out
+
+
+def _run(backend, chunks) -> tuple:
+    """(seconds, text) for transcribing all chunks with one backend."""
+    t0 = time.perf_counter()
+    texts = [" ".join(s["text"].strip() for s in backend.transcribe(c.as_array())) for c in chunks]
+    return time.perf_counter() - t0, " ".join(texts)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CPU real-time factor of the local STT backends.")
+    ap.add_argument("--audio", help="a recording (any format ffmpeg reads); default: synthetic tones")
+    ap.add_argument("--seconds", type=int, default=120, help="length of the clip to transcribe")
+    ap.add_argument("--model", default="large")
+    ap.add_argument("--backends", nargs="*", default=["openai-whisper", "faster-whisper"])
+    ap.add_argument("--threads", nargs="*", type=int, default=[0], help="faster-whisper CPU threads (0 = all)")
+    ap.add_argument("--batch-size", nargs="*", type=int, default=[8], help="faster-whisper batch sizes")
+    args = ap.parse_args()
+
+    from stt_backends import BACKENDS, STT_CPU_THREADS, FasterWhisperBackend, available, get_backend
+
+    path = _clip(args.audio, args.seconds) if args.audio else _synthetic(args.seconds)
+    chunks = list(chunks_for(path, vad=True, stats=SegmentStats(), chunk_length_s=300))
+    audio_s = sum(c.duration for c in chunks)
+    print(f"{audio_s:.0f} s of speech in {len(chunks)} chunk(s), model {args.model}, {os.cpu_count()} CPUs")
+
+    runs = []
+    for name in args.backends:
+        if not available(name):  # get_backend() would import the missing packages right away
+            print(f"{name:45s} skipped: needs {', '.join(BACKENDS[name].requires)} (not installed)")
+            continue
+        if name == "faster-whisper":
+            runs += [(f"{name} int8 threads={t or STT_CPU_THREADS} batch={b}",
+                      FasterWhisperBackend(args.model, threads=t or STT_CPU_THREADS, batch_size=b))
+                     for t in args.threads for b in args.batch_size]
+        else:
+            runs.append((name, get_backend(name, args.model)))
+
+    reference = None
+    for label, backend in runs:
+        try:
+            t0 = time.perf_counter()
+            backend.transcribe(chunks[0].as_array()[:16000])  # load the model (and warm up) outside the timing
+            load_s = time.perf_counter() - t0
+        except ImportError as e:
+            print(f"{label:45s} skipped: {e}")
+            continue
+        seconds, text = _run(backend, chunks)
+        reference = text if reference is None else reference
+        same = SequenceMatcher(None, reference, text, autojunk=False).ratio() if reference else 1.0
+        print(f"{label:45s} load {load_s:6.1f} s  RTF {seconds / audio_s:6.3f}  "
+              f"({seconds:6.1f} s)  text similarity to first {same:.2f}")
+
+
+if __name__ == "__main__":
+    main()
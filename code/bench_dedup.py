@@ -0,0 +1,130 @@
+# bench_dedup.py — dedup.py vs. the original pipeline.py loops over every transcript in data/
+#
+#   python code/bench_dedup.py [--repeat 20]
+#
+# Checks that remove_duplicate_lines and the per-segment filter give identical output to the
+# original implementations (copied below), then times both.
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import Levenshtein
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from dedup import SegmentFilter, remove_duplicate_lines, remove_duplicate_lines_batch  # noqa: E402
+
+
+# --- original implementations (pipeline.py before dedup.py) ---
+def ref_is_valid_segment(text, previous_segments, min_length=3, similarity_threshold=0.8):
+    text = str(text).strip()
+    if len(text) < min_length:
+        return False
+    if text.replace('.', '').replace(',', '').replace('?', '').replace('!', '').strip() == '':
+        return False
+    for prev_text in previous_segments[-5:]:
+        prev_text = str(prev_text)
+        similarity = Levenshtein.ratio(text.lower(), prev_text.lower())
+        if similarity > similarity_threshold:
+            return False
+    return True
+
+
+def ref_filter_segments(texts):
+    """The segment loop of transcribe_chunks, minus Whisper."""
+    transcript = []
+    recent_segments = []
+    for i, text in enumerate(texts):
+        text = str(text).strip()
+        if not ref_is_valid_segment(text, recent_segments):
+            continue
+        if text in [str(line.split('] ', 1)[1]) for line in transcript[-3:] if '] ' in line]:
+            continue
+        transcript.append(f"[{i}] {text}")
+        recent_segments.append(text)
+        if len(recent_segments) > 10:
+            recent_segments.pop(0)
+    return transcript
+
+
+def ref_remove_duplicate_lines(transcript, similarity_threshold=0.85):
+    if not transcript:
+        return transcript
+    cleaned_transcript = [transcript[0]]
+    for i in range(1, len(transcript)):
+        current_line = transcript[i]
+        current_text = str(current_line.split('] ', 1)[1] if '] ' in current_line else current_line)
+        is_duplicate = False
+        for j in range(max(0, len(cleaned_transcript) - 3), len(cleaned_transcript)):
+            prev_line = cleaned_transcript[j]
+            prev_text = str(prev_line.split('] ', 1)[1] if '] ' in prev_line else prev_line)
+            if current_text == prev_text:
+                is_duplicate = True
+                break
+            similarity = Levenshtein.ratio(current_text.lower(), prev_text.lower())
+            if similarity > similarity_threshold:
+                if len(current_text) > len(prev_text):
+                    cleaned_transcript[j] = current_line
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            cleaned_transcript.append(current_line)
+    return cleaned_transcript
+
+
+def new_filter_segments(texts):
+    f = SegmentFilter()
+    return [f"[{i}] {str(t).strip()}" for i, t in enumerate(texts) if f.accept(t)]
+
+
+def _load():
+    transcripts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "data", "*", "*_transcript.txt"))):
+        with open(path, encoding="utf-8") as f:
+            transcripts.append([ln.rstrip("\n") for ln in f if ln.strip()])
+    return transcripts
+
+
+def _time(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - t0) / repeat, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    transcripts = _load()
+    # a cohort-sized stream: all raw angles back to back, as the batch path sees them
+    merged = [ln for t in transcripts for ln in t]
+    texts = [ln.split('] ', 1)[1] if '] ' in ln else ln for ln in merged]
+    print(f"{len(transcripts)} transcripts, {len(merged)} lines")
+
+    rows = [
+        ("remove_duplicate_lines (per file)",
+         lambda: [ref_remove_duplicate_lines(t) for t in transcripts],
+         lambda: remove_duplicate_lines_batch(transcripts)),
+        ("remove_duplicate_lines (all lines)",
+         lambda: ref_remove_duplicate_lines(merged),
+         lambda: remove_duplicate_lines(merged)),
+        ("segment filter (is_valid_segment)",
+         lambda: ref_filter_segments(texts),
+         lambda: new_filter_segments(texts)),
+    ]
+    for name, ref, new in rows:
+        t_ref, out_ref = _time(ref, args.repeat)
+        t_new, out_new = _time(new, args.repeat)
+        assert out_ref == out_new, f"{name}: output differs"
+        print(f"{name:36s} original {t_ref * 1000:8.2f} ms   new {t_new * 1000:8.2f} ms   x{t_ref / t_new:.2f}  (identical)")
+
+
+if __name__ == "__main__":
+    main()
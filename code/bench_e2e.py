@@ -0,0 +1,273 @@
+# bench_e2e.py — offline end-to-end benchmark against fake_openai.py (no key, no real media)
+#
+#   python code/bench_e2e.py                          # run, compare with code/bench_baseline.json
+#   python code/bench_e2e.py --save-baseline          # record the baseline on this machine
+#   python code/bench_e2e.py --save-baseline --paths pipeline_for_video_openai   # (re-)record one path only
+#   python code/bench_e2e.py --lengths 60 --latency 0.5 --throttle-every 5
+#
+# For every path and recording length, one fresh subprocess runs --sessions sessions of three
+# synthetic camera angles (AAC tone bursts with pauses, generated once with ffmpeg): transcribe
+# all angles concurrently (run_session, as app.py does), then the GPT merge and the assessment.
+# The fake server answers transcription requests with lines from the data/ transcripts (about
+# one line per 6 s of audio) and chat requests like fake_openai.fake_chat_reply.
+#
+# The fake server runs in this (driver) process, so the peak RSS of each run covers only the
+# pipeline: reported per path/length are mean session wall time, sessions per minute, peak RSS
+# and per-stage latency from the tracing.py spans, each the median over --repeat child processes
+# (peak RSS is the child's own VmHWM: ru_maxrss carries over the driver's RSS at spawn time, which
+# grows with the audio the fake server has received, so later paths read high).
+# A metric more than --tolerance worse than the baseline is flagged and the exit code is 1.
+# Paths whose dependencies are missing (whisper/torch for pipeline_for_video) are reported as skipped.
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from fake_openai import FakeOpenAI  # noqa: E402
+
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+PATHS = ("transcribe_long_with_openai", "pipeline_for_video_openai", "pipeline_for_video")
+ANGLES = (220, 330, 440)  # one tone per synthetic camera angle
+BYTES_PER_S = 16000 * 2   # 16 kHz s16le WAV chunks
+
+
+# --- synthetic audio ---
+def make_audio(out_dir: str, seconds: int, freq: int) -> str:
+    """`seconds` of 6 s tone / 3 s silence (so the VAD has pauses to cut), AAC like a phone video."""
+    path = os.path.join(out_dir, f"angle{freq}_{seconds}s.m4a")
+    if not os.path.exists(path):
+        os.makedirs(out_dir, exist_ok=True)
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency={freq}:duration={seconds}",
+             "-af", "volume='if(lt(mod(t,9),6),0.5,0)':eval=frame", "-ac", "1", "-ar", "44100",
+             "-c:a", "aac", "-b:a", "96k", path],
+            check=True,
+        )
+    return path
+
+
+# --- canned STT output ---
+def canned_stt():
+    """stt_fn for FakeOpenAI: data/ transcript lines, about one per 6 s of uploaded audio."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "data", "*", "*_transcript.txt"))):
+        with open(path, encoding="utf-8") as f:
+            texts += [ln.split("] ", 1)[-1].strip() for ln in f if ln.strip()]
+    pool = itertools.cycle(texts or ["שלום"])
+    lock = threading.Lock()
+
+    def stt(payload: bytes) -> str:
+        n = max(1, int(len(payload) / BYTES_PER_S / 6))
+        with lock:
+            return "\n".join(next(pool) for _ in range(n))
+
+    return stt
+
+
+# --- one path in a fresh process ---
+def _transcriber(path_name: str, api_key: str, whisper_model: str):
+    if path_name == "transcribe_long_with_openai":
+        from openai_stt import transcribe_long_with_openai
+        return lambda p: transcribe_long_with_openai(p, api_key)
+    import pipeline
+    if path_name == "pipeline_for_video_openai":
+        return lambda p: pipeline.pipeline_for_video_openai(p, api_key)
+    from stt_backends import load_backend
+    load_backend("openai-whisper")  # ImportError without whisper + torch
+    return lambda p: pipeline.pipeline_for_video(p, model_name=whisper_model)
+
+
+def _peak_rss_mb() -> float:
+    """This process's peak RSS (VmHWM is reset at exec, unlike ru_maxrss)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(args) -> dict:
+    """One path/length; OPENAI_BASE_URL points at the driver's fake server."""
+    files = [make_audio(args.audio_dir, args.child_length, f) for f in ANGLES]
+    try:
+        transcribe = _transcriber(args.child, "sk-fake", args.whisper_model)
+    except ImportError as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+    import tracing
+    from gpt_utils import assess_transcript_quality, combine_transcripts_with_gpt
+    from openai_client import stats
+    from scheduler import run_session
+
+    walls, stages = [], {}
+    t_all = time.perf_counter()
+    for s in range(args.sessions):
+        with tracing.session(f"bench-{s}") as trace:
+            raw = [None] * len(files)
+            for i, lines, err in run_session(files, transcribe):
+                if err is not None:
+                    raise err
+                raw[i] = "\n".join(lines)
+            merged = combine_transcripts_with_gpt(raw, "sk-fake")
+            assess_transcript_quality(merged, "sk-fake")
+        walls.append(trace.wall_s)
+        for name, row in trace.stages().items():
+            acc = stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            acc["calls"] += row["calls"]
+            acc["seconds"] += row["seconds"]
+    total = time.perf_counter() - t_all
+
+    return {
+        "session_s": sum(walls) / len(walls),
+        "sessions_per_min": 60.0 * len(walls) / total,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages_ms": {k: 1000 * v["seconds"] / v["calls"] for k, v in sorted(stages.items())},
+        "api": stats(),
+    }
+
+
+# --- driver ---
+LOWER_IS_BETTER = ("session_s", "peak_rss_mb")
+
+
+def _compare(cur: dict, base: dict, tolerance: float):
+    """Yield (metric, current, baseline, change, regressed)."""
+    rows = [(k, cur.get(k), base.get(k), k in LOWER_IS_BETTER) for k in (*LOWER_IS_BETTER, "sessions_per_min")]
+    rows += [(f"stage {k} ms", v, base.get("stages_ms", {}).get(k), True) for k, v in cur.get("stages_ms", {}).items()]
+    for metric, c, b, lower in rows:
+        if c is None or not b:
+            yield metric, c, b, None, False
+            continue
+        change = (c - b) / b
+        yield metric, c, b, change, (change > tolerance) if lower else (change < -tolerance)
+
+
+def _median(runs: list) -> dict:
+    """Per-metric median of several child results (api counters from the first run)."""
+    out = dict(runs[0])
+    for k in ("session_s", "sessions_per_min", "peak_rss_mb"):
+        out[k] = statistics.median(r[k] for r in runs)
+    out["stages_ms"] = {k: statistics.median(r["stages_ms"][k] for r in runs if k in r["stages_ms"])
+                        for k in runs[0]["stages_ms"]}
+    out["runs"] = len(runs)
+    return out
+
+
+def _run_one(args, path_name: str, seconds: int, env: dict) -> dict:
+    key = f"{path_name}@{seconds}s"
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", path_name, "--child-length", str(seconds),
+           "--audio-dir", args.audio_dir, "--sessions", str(args.sessions), "--whisper-model", args.whisper_model]
+    runs = []
+    for _ in range(args.repeat):
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+        if proc.returncode != 0:
+            r = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        else:
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+        if "skipped" in r or "error" in r:
+            print(f"{key:40s} {'skipped' if 'skipped' in r else 'ERROR'}: {r.get('skipped') or r.get('error')}")
+            return r
+        runs.append(r)
+    r = _median(runs)
+    stages = "  ".join(f"{k}={v:.0f}ms" for k, v in r["stages_ms"].items())
+    rss = "/".join(f"{x['peak_rss_mb']:.0f}" for x in runs)
+    print(f"{key:40s} {r['session_s']:7.2f} s/session  {r['sessions_per_min']:6.1f} sessions/min  "
+          f"peak {r['peak_rss_mb']:.0f} MB ({rss})  retried={r['api']['retried']}\n{'':40s} {stages}")
+    return r
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline end-to-end benchmark against a fake OpenAI server.")
+    ap.add_argument("--paths", nargs="*", default=list(PATHS), choices=PATHS)
+    ap.add_argument("--lengths", nargs="*", type=int, default=[60, 300, 900], help="recording lengths (s)")
+    ap.add_argument("--sessions", type=int, default=2, help="sessions per path and length")
+    ap.add_argument("--latency", type=float, default=0.2, help="fake API latency per request (s)")
+    ap.add_argument("--throttle-every", type=int, default=0, help="fake 429 on every Nth request")
+    ap.add_argument("--whisper-model", default="tiny")
+    ap.add_argument("--audio-dir", default=os.path.join(tempfile.gettempdir(), "nee-bench-audio"))
+    ap.add_argument("--repeat", type=int, default=3, help="child runs per path and length (medians are reported)")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="allowed relative slowdown vs. baseline")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--child-length", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return 0
+
+    for seconds in args.lengths:  # generate outside the timed runs
+        for f in ANGLES:
+            make_audio(args.audio_dir, seconds, f)
+
+    params = {k: getattr(args, k) for k in ("sessions", "latency", "throttle_every", "whisper_model")}
+    env = dict(os.environ, NEE_CACHE="0", NEE_TRACE="1", NEE_TRACE_DIR="")  # measure the work, not the cache
+    results = {}
+    fake = FakeOpenAI(latency=args.latency, throttle_every=args.throttle_every, stt_fn=canned_stt())
+    with fake:
+        env["OPENAI_BASE_URL"] = fake.base_url
+        for path_name in args.paths:
+            for seconds in args.lengths:
+                results[f"{path_name}@{seconds}s"] = _run_one(args, path_name, seconds, env)
+
+    if args.save_baseline:
+        machine = {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+        saved = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                old = json.load(f)
+            if old.get("params") == params and old.get("machine") == machine:
+                saved = old["results"]  # same setup: only the paths/lengths run now are replaced
+        saved.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine, "params": params, "results": saved}, f, indent=2, ensure_ascii=False)
+        print(f"baseline written to {args.baseline} ({len(results)} of {len(saved)} entries updated)")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline yet (run with --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("params") != params:
+        print(f"note: baseline was recorded with {baseline.get('params')}, this run used {params}")
+    print(f"\nvs. baseline ({baseline['machine']['platform']}, {baseline['machine']['cpus']} CPU):")
+    regressions = 0
+    for key, cur in results.items():
+        base = baseline["results"].get(key)
+        if "session_s" not in cur:
+            continue  # skipped/failed now: already reported above
+        if not base or "session_s" not in base:
+            why = f"baseline skipped: {base['skipped']}" if base and "skipped" in base else "not in baseline"
+            print(f"  {key:40s} no baseline ({why}; record it with --save-baseline --paths {key.split('@')[0]})")
+            continue
+        for metric, c, b, change, regressed in _compare(cur, base, args.tolerance):
+            if change is None:
+                continue
+            regressions += regressed
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {key:40s} {metric:24s} {c:10.2f} vs {b:10.2f}  {change:+6.0%}{flag}")
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
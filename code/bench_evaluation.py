@@ -0,0 +1,92 @@
+# bench_evaluation.py — notebook-style evaluation vs. evaluation.py (Parquet cache + vectorized bootstrap)
+#
+#   python code/bench_evaluation.py [--resamples 10000] [--repeat 3]
+#
+# "notebook": pd.read_excel of data/records_informations.xlsx on every run, then one resample at a
+# time in a Python loop (pandas mode, NumPy errors), as extending the notebook cells would. "module":
+# evaluation.load_records (Parquet after the first run) + evaluation.bootstrap in one vectorized pass.
+# Both use the same resample indices and random guesses, and the per-resample metrics are checked
+# to be identical before timing.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+os.environ["NEE_EVAL_DIR"] = tempfile.mkdtemp(prefix="nee-eval-bench-")
+
+import evaluation  # noqa: E402
+from evaluation import LABEL_COL, PRED_COL, RECORDS_XLSX, SCALE  # noqa: E402
+
+
+def notebook_bootstrap(resamples, seed=evaluation.BOOTSTRAP_SEED):
+    df = pd.read_excel(RECORDS_XLSX, sheet_name=evaluation.SHEET)
+    df = df[[LABEL_COL, PRED_COL]].apply(pd.to_numeric, errors="coerce").dropna()
+    t = df[LABEL_COL].astype(float).to_numpy()
+    p = df[PRED_COL].astype(float).to_numpy()
+    n = len(t)
+    rng = np.random.default_rng(seed)
+    # same draws as evaluation.bootstrap (one block at this size)
+    idx = rng.integers(0, n, size=(resamples, n))
+    guesses = rng.integers(SCALE[0], SCALE[1] + 1, size=(resamples, n)).astype(float)
+    out = {k: np.empty(resamples) for k in ("mae", "rmse", "rmse_random", "rmse_mean", "rmse_mode")}
+    for b in range(resamples):
+        y_true, y_pred = t[idx[b]], p[idx[b]]
+        mode_val = pd.Series(y_true).mode().iloc[0]
+        out["mae"][b] = np.abs(y_true - y_pred).mean()
+        out["rmse"][b] = np.sqrt(np.mean((y_true - y_pred) ** 2))
+        out["rmse_random"][b] = np.sqrt(np.mean((y_true - guesses[b]) ** 2))
+        out["rmse_mean"][b] = np.sqrt(np.mean((y_true - y_true.mean()) ** 2))
+        out["rmse_mode"][b] = np.sqrt(np.mean((y_true - mode_val) ** 2))
+    return out
+
+
+def module_bootstrap(resamples):
+    df = evaluation.load_records()
+    return evaluation.bootstrap(df[LABEL_COL], df[PRED_COL], resamples)
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--resamples", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    evaluation.load_records()  # first run: Excel -> Parquet
+    convert_s = time.perf_counter() - t0
+
+    old, new = notebook_bootstrap(args.resamples), module_bootstrap(args.resamples)
+    for k, v in old.items():
+        assert np.allclose(v, new[k], rtol=0, atol=1e-12), k
+
+    rows = [
+        ("load records", _best(lambda: pd.read_excel(RECORDS_XLSX), args.repeat),
+         _best(evaluation.load_records, args.repeat)),
+        (f"load + bootstrap x{args.resamples}", _best(lambda: notebook_bootstrap(args.resamples), args.repeat),
+         _best(lambda: module_bootstrap(args.resamples), args.repeat)),
+    ]
+    print(f"one-time Excel -> Parquet conversion: {convert_s * 1000:.1f} ms; per-resample metrics identical")
+    for name, a, b in rows:
+        print(f"{name:22s} notebook {a * 1000:9.1f} ms   module {b * 1000:8.1f} ms   x{a / b:.1f}")
+
+
+if __name__ == "__main__":
+    main()
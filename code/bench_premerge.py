@@ -0,0 +1,73 @@
+# bench_premerge.py — merge-prompt size with and without the local pre-merge, over data/
+#
+#   python code/bench_premerge.py [--sessions 101 102 ...]
+#
+# Prompt tokens are counted with tiktoken (o200k_base, GPT-4o's encoding) when it is installed,
+# otherwise estimated. "coverage" is the share of lines in the stored GPT-merged reference
+# data/<id>/<id>.txt that still have a close match (±15 s) in what GPT would be sent — a check
+# that collapsing duplicates did not drop conversation content.
+
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from batch_eval import _read, discover_sessions, reference_merge  # noqa: E402
+from dedup import similar  # noqa: E402
+from gpt_utils import _build_merge_prompt  # noqa: E402
+from premerge import parse_transcript, premerge_transcripts  # noqa: E402
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("o200k_base")
+        return (lambda s: len(enc.encode(s))), "tiktoken o200k_base"
+    except Exception:
+        # Hebrew runs ~3 characters per GPT-4o token; fine for relative comparisons
+        return (lambda s: max(1, round(len(s) / 3))), "estimated (chars/3)"
+
+
+def _coverage(reference: str, lines, window_s: int = 15) -> float:
+    ref = [(sec, text.split(":", 1)[1].strip().lower() if ":" in text else text.lower())
+           for sec, text in parse_transcript(reference)]
+    cand = [(sec, text.lower()) for sec, text in lines]
+    hit = 0
+    for sec, text in ref:
+        if any(abs(sec - s) <= window_s and (text in t or t in text or similar(text, t, 0.5))
+               for s, t in cand if t):
+            hit += 1
+    return hit / len(ref) if ref else 1.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=os.path.join(ROOT, "data"))
+    ap.add_argument("--sessions", nargs="*")
+    args = ap.parse_args()
+
+    count, how = _token_counter()
+    sessions = discover_sessions(args.data, args.sessions)
+    print(f"prompt tokens: {how}")
+    print(f"{'session':>7} {'raw':>7} {'premerged':>9} {'saved':>6} {'ref out':>7} {'cov raw':>7} {'cov pre':>7}")
+    tot_raw = tot_pre = 0
+    for sid, paths in sessions.items():
+        transcripts = [_read(p) for p in paths]
+        raw = count(_build_merge_prompt(transcripts))
+        pre = count(_build_merge_prompt(transcripts, premerge=True))
+        ref = reference_merge(args.data, sid) or ""
+        raw_lines = [x for t in transcripts for x in parse_transcript(t)]
+        pre_lines = parse_transcript("\n".join(premerge_transcripts(transcripts)))
+        tot_raw += raw
+        tot_pre += pre
+        print(f"{sid:>7} {raw:7d} {pre:9d} {100 * (1 - pre / raw):5.0f}% {count(ref):7d} "
+              f"{_coverage(ref, raw_lines):7.0%} {_coverage(ref, pre_lines):7.0%}")
+    if tot_raw:
+        print(f"{'total':>7} {tot_raw:7d} {tot_pre:9d} {100 * (1 - tot_pre / tot_raw):5.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench_segmenter.py — streaming segmenter vs. the old extract -> pydub -> re-encode path
+#
+#   python code/bench_segmenter.py [--minutes 60] [--input recording.mp4]
+#
+# Without --input an hour-long synthetic AAC file is generated with ffmpeg.
+# Each path runs in its own interpreter so peak RSS (ru_maxrss) is measured per path;
+# ffmpeg runs as a child process in both paths and is not counted.
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+CHUNK_LENGTH_MS = 5 * 60 * 1000
+
+
+def _legacy(path: str) -> int:
+    """The previous path: ffmpeg -> temp mp3, pydub decode of the whole file, one temp mp3 per chunk."""
+    from pydub import AudioSegment
+    tmp = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+    tmp.close()
+    subprocess.run(["ffmpeg", "-y", "-i", path, "-vn", "-acodec", "mp3", tmp.name],
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    wav = tmp.name[:-4] + ".wav"
+    n = 0
+    try:
+        # AudioSegment.from_file(mp3) = ffprobe for the sample format + ffmpeg to s16 WAV + a full read.
+        # Same decode with ffmpeg alone (no ffprobe needed), then pydub reads the whole WAV into memory.
+        subprocess.run(["ffmpeg", "-y", "-i", tmp.name, "-vn", "-acodec", "pcm_s16le", "-f", "wav", wav],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        audio = AudioSegment.from_file(wav, format="wav")
+        for i in range(0, len(audio), CHUNK_LENGTH_MS):
+            chunk_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+            audio[i:i + CHUNK_LENGTH_MS].export(chunk_file.name, format="mp3")
+            os.remove(chunk_file.name)
+            n += 1
+    finally:
+        for f in (tmp.name, wav):
+            if os.path.exists(f):
+                os.remove(f)
+    return n
+
+
+def _streaming(path: str) -> int:
+    from audio_stream import iter_chunks
+    n = 0
+    for chunk in iter_chunks(path):
+        chunk.as_wav()  # what the OpenAI path uploads
+        n += 1
+    return n
+
+
+def _run_one(mode: str, path: str):
+    t0 = time.perf_counter()
+    n = (_legacy if mode == "legacy" else _streaming)(path)
+    wall = time.perf_counter() - t0
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(json.dumps({"mode": mode, "chunks": n, "wall_s": wall, "peak_rss_mb": rss_mb}))
+
+
+def _make_input(minutes: int) -> str:
+    out = os.path.join(tempfile.gettempdir(), f"bench_segmenter_{minutes}min.m4a")
+    if not os.path.exists(out):
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"sine=frequency=440:sample_rate=44100:duration={minutes * 60}",
+                        "-ac", "2", "-c:a", "aac", out], check=True)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=int, default=60)
+    ap.add_argument("--input")
+    ap.add_argument("--mode", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    path = args.input or _make_input(args.minutes)
+    if args.mode:
+        return _run_one(args.mode, path)
+
+    print(f"input: {path}")
+    for mode in ("legacy", "streaming"):
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, "--input", path],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"{mode:10s} failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{mode:10s} chunks={r['chunks']:3d}  wall={r['wall_s']:7.2f}s  peak RSS={r['peak_rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench_segments.py — loading data/ as line strings vs. segments.Segments
+#
+#   python code/bench_segments.py [--repeat 15]
+#
+# "strings": every transcript file as a list of '[H:MM:SS] text' lines, parsed with the original
+# regex (premerge.py before segments.py) whenever a stage needs the times, as premerge, windowing
+# and dedup each did. "segments": every file parsed once into a Segments (column arrays + texts).
+# Reported: load time, memory retained by the loaded transcripts (tracemalloc), and the time to
+# window + pre-merge every session from the strings vs. from the already-parsed segments. The
+# parsed times/texts and the produced prompts are checked to be identical. Times are the median
+# process CPU time of --repeat runs, the two variants alternating (wall-clock minima of a few runs
+# swung by +-30% on a shared machine).
+
+import argparse
+import gc
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from batch_eval import _read, discover_sessions  # noqa: E402
+from premerge import premerge_transcripts  # noqa: E402
+from segments import Segments  # noqa: E402
+from windowed_merge import split_windows  # noqa: E402
+
+# --- original parser (premerge.py before segments.py) ---
+LINE_RE = re.compile(r"^\[(\d+):(\d{1,2}):(\d{1,2})\]\s*(.*)$")
+
+
+def ref_parse_transcript(transcript):
+    out = []
+    last = 0
+    for raw in str(transcript).splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        m = LINE_RE.match(raw)
+        if m:
+            last = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3))
+            text = m.group(4).strip()
+        else:
+            text = raw
+        if text:
+            out.append((last, text))
+    return out
+
+
+def _median(old, new, repeat):
+    """Median CPU seconds of old() and of new(), run alternately."""
+    times = ([], [])
+    for _ in range(repeat):
+        for fn, out in zip((old, new), times):
+            t0 = time.process_time()
+            fn()
+            out.append(time.process_time() - t0)
+    return statistics.median(times[0]), statistics.median(times[1])
+
+
+def _retained(load):
+    """Bytes still allocated by load()'s result."""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=15)
+    args = ap.parse_args()
+
+    sessions = discover_sessions(os.path.join(ROOT, "data"))
+    texts = {sid: [_read(p) for p in paths] for sid, paths in sessions.items()}
+    n_files = sum(len(v) for v in texts.values())
+    n_lines = sum(t.count("\n") + 1 for v in texts.values() for t in v)
+
+    def load_strings():
+        # lines for the UI/export + the (sec, text) pairs every stage parsed for itself
+        return {sid: [(t.splitlines(), ref_parse_transcript(t)) for t in v] for sid, v in texts.items()}
+
+    def load_segments():
+        return {sid: [Segments.parse(t, source=i) for i, t in enumerate(v)] for sid, v in texts.items()}
+
+    # same content
+    for sid, v in texts.items():
+        for t in v:
+            segs = Segments.parse(t)
+            assert ref_parse_transcript(t) == [(int(s), x) for s, x in zip(segs.start, segs.text)], sid
+
+    loaded = load_segments()
+
+    def stages_strings():
+        return [premerge_transcripts(w[2]) for v in texts.values() for w in split_windows(v, 120, 30)]
+
+    def stages_segments():
+        return [premerge_transcripts(w[2]) for v in loaded.values() for w in split_windows(v, 120, 30)]
+
+    assert stages_strings() == stages_segments()
+
+    print(f"{len(texts)} sessions, {n_files} transcripts, {n_lines} lines")
+    rows = [
+        ("load", *_median(load_strings, load_segments, args.repeat), "ms"),
+        ("memory retained", _retained(load_strings), _retained(load_segments), "MB"),
+        ("windows + pre-merge", *_median(stages_strings, stages_segments, args.repeat), "ms"),
+    ]
+    for name, old, new, unit in rows:
+        scale = 1000 if unit == "ms" else 1 / 1e6
+        print(f"{name:22s} strings {old * scale:8.2f} {unit}   segments {new * scale:8.2f} {unit}   x{old / new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
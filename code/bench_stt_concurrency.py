@@ -0,0 +1,74 @@
+# bench_stt_concurrency.py — sequential vs. concurrent chunk transcription against fake_openai.py
+#
+#   python code/bench_stt_concurrency.py [--chunks 9] [--workers 4]
+#
+# Each fake chunk sleeps for a different time (later chunks answer first), so the
+# run also checks that lines come back in offset order, exactly as the serial loop produced them.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from audio_stream import CHUNK_LENGTH_S  # noqa: E402
+from openai_stt import transcribe_chunks_concurrently, transcribe_with_openai_single  # noqa: E402
+from segments import format_stamp  # noqa: E402
+
+
+def _make_chunks(n: int, base_sleep: float):
+    chunks = []
+    for i in range(n):
+        fp = tempfile.NamedTemporaryFile(delete=False, suffix=".txt").name
+        with open(fp, "w", encoding="utf-8") as f:
+            # descending latency: the last chunk finishes first
+            f.write(f"chunk {i} sleep={base_sleep * (n - i) / n:.3f}\nsecond line of chunk {i}")
+        chunks.append((fp, i * CHUNK_LENGTH_S))
+    return chunks
+
+
+def _to_lines(results):
+    lines = []
+    for start_sec, txt in results:
+        for sent in [s.strip() for s in txt.replace("\r", " ").split("\n") if s.strip()]:
+            lines.append(f"[{format_stamp(start_sec, pad=True)}] {sent}")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=9)  # 45-minute session
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--sleep", type=float, default=0.5, help="latency of the slowest chunk (s)")
+    args = ap.parse_args()
+
+    chunks = _make_chunks(args.chunks, args.sleep)
+    try:
+        with FakeOpenAI() as fake:
+            os.environ["OPENAI_BASE_URL"] = fake.base_url
+            fn = lambda p: transcribe_with_openai_single(p, "sk-fake")  # noqa: E731
+
+            t0 = time.perf_counter()
+            serial = [(off, fn(p)) for p, off in chunks]
+            t_serial = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            pooled = transcribe_chunks_concurrently(chunks, fn, max_workers=args.workers)
+            t_pooled = time.perf_counter() - t0
+    finally:
+        for p, _ in chunks:
+            os.remove(p)
+
+    assert _to_lines(pooled) == _to_lines(serial), "concurrent output differs from serial output"
+    print(f"chunks={args.chunks} workers={args.workers}")
+    print(f"serial:     {t_serial:.2f}s")
+    print(f"concurrent: {t_pooled:.2f}s  (x{t_serial / t_pooled:.1f})")
+    print("ordering:   identical [HH:MM:SS] lines")
+
+
+if __name__ == "__main__":
+    main()
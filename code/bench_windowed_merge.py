@@ -0,0 +1,82 @@
+# bench_windowed_merge.py — single-call vs. windowed merge against fake_openai.py
+#
+#   python code/bench_windowed_merge.py [--sessions 5] [--per-line 0.01]
+#
+# The fake merge answers with every raw line in time order and sleeps per output line, like a
+# model generating tokens. Back-to-back data/ sessions form one long simulation; the run reports
+# the wall time of both modes and checks that the stitched output has the same lines as the
+# single call (apart from cross-angle repeats collapsed at the window seams) in the same order.
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+os.environ["NEE_CACHE"] = "0"  # time the calls, not the cache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from fake_openai import FakeOpenAI, fake_chat_reply  # noqa: E402
+from batch_eval import _read, discover_sessions  # noqa: E402
+from gpt_utils import combine_transcripts_windowed, combine_transcripts_with_gpt  # noqa: E402
+from premerge import parse_transcript  # noqa: E402
+from windowed_merge import split_windows  # noqa: E402
+
+
+def _long_session(n: int):
+    """n data/ sessions one after another, as one multi-angle session."""
+    angles = {}
+    offset = 0
+    for paths in list(discover_sessions(os.path.join(ROOT, "data")).values())[:n]:
+        end = 0
+        for a, p in enumerate(paths[:3]):
+            lines = parse_transcript(_read(p))
+            angles.setdefault(a, []).extend(f"[{timedelta(seconds=s + offset)}] {t}" for s, t in lines)
+            end = max([end] + [s for s, _ in lines])
+        offset += end + 5
+    return ["\n".join(v) for v in angles.values()], offset
+
+
+def _texts(merged: str):
+    return [line.split(": ", 1)[1] for line in merged.splitlines() if ": " in line]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=5)
+    ap.add_argument("--per-line", type=float, default=0.01, help="fake generation time per output line (s)")
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    def slow_reply(body):
+        content = fake_chat_reply(body)
+        time.sleep(args.per_line * content.count("\n"))
+        return content
+
+    transcripts, length = _long_session(args.sessions)
+    windows = split_windows(transcripts)
+    print(f"session {timedelta(seconds=length)}, {sum(t.count(chr(10)) + 1 for t in transcripts)} raw lines, "
+          f"{len(windows)} windows")
+    with FakeOpenAI(chat_fn=slow_reply) as fake:
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        t0 = time.perf_counter()
+        single = combine_transcripts_with_gpt(transcripts, "sk-fake")
+        t_single = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        windowed = combine_transcripts_windowed(transcripts, "sk-fake", max_workers=args.workers)
+        t_windowed = time.perf_counter() - t0
+
+    a, b = _texts(single), _texts(windowed)
+    missing = [t for t in a if t not in set(b)]
+    it = iter(a)
+    in_order = all(t in it for t in b)
+    print(f"single call  {t_single:6.2f} s  {len(a)} lines")
+    print(f"windowed     {t_windowed:6.2f} s  {len(b)} lines  x{t_single / t_windowed:.2f}")
+    print(f"lines only in the single call: {len(missing)}; windowed order matches: {in_order}")
+
+
+if __name__ == "__main__":
+    main()
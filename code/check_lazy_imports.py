@@ -0,0 +1,60 @@
+# check_lazy_imports.py — app startup with the OpenAI engine must not import torch / whisper
+#
+#   python code/check_lazy_imports.py        # exit code 1 if a heavy package was imported
+#
+# Runs app.py once the way Streamlit does (streamlit.testing AppTest, default engine = OpenAI API)
+# with an import hook that records every attempt to import a heavy STT package, whether or not it
+# is installed here. Also prints the script run time and stt_backends.import_times().
+
+import importlib.abc
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+HEAVY = ("torch", "whisper", "faster_whisper", "ctranslate2")
+
+
+class _ImportRecorder(importlib.abc.MetaPathFinder):
+    """Notes attempted imports of HEAVY packages; the normal finders still do the importing."""
+
+    def __init__(self):
+        self.attempts = []
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.split(".")[0] in HEAVY:
+            self.attempts.append(fullname)
+        return None
+
+
+def main() -> int:
+    from streamlit.testing.v1 import AppTest
+
+    recorder = _ImportRecorder()
+    sys.meta_path.insert(0, recorder)
+    os.chdir(ROOT)
+    t0 = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60).run()
+    elapsed = time.perf_counter() - t0
+    sys.meta_path.remove(recorder)
+
+    from stt_backends import import_times
+    loaded = sorted(m for m in sys.modules if m.split(".")[0] in HEAVY)
+    errors = [e.value for e in at.exception]
+    print(f"app.py first run: {elapsed:.2f} s, engine {at.sidebar.radio[0].value!r}")
+    print(f"backend imports: {import_times() or 'none'}")
+    if errors:
+        print(f"FAIL: the script raised: {errors}")
+        return 1
+    if recorder.attempts or loaded:
+        print(f"FAIL: heavy imports at startup: attempted {sorted(set(recorder.attempts))}, loaded {loaded}")
+        return 1
+    print(f"OK: none of {', '.join(HEAVY)} imported")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# fake_openai.py — local stand-in for the OpenAI HTTP API (no network, no key)
+#
+# Point the SDK at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+#
+#   POST /v1/audio/transcriptions  -> echoes the uploaded file if it is UTF-8 text
+#                                     ("sleep=<seconds>" anywhere in it delays the reply),
+#                                     or stt_fn(file bytes) when given (e.g. canned transcripts)
+#   POST /v1/chat/completions      -> merge prompts: the raw lines in time order, tagged "Nurse:"
+#                                     empathy prompts: a fixed one-line score
+#                                     "stream": true -> the same text as server-sent event chunks
+#   throttle_every=N                   -> every Nth request is answered 429 with retry-after-ms
+#
+# Standalone:  python code/fake_openai.py --port 8000
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SLEEP_RE = re.compile(rb"sleep=([0-9.]+)")
+_LINE_RE = re.compile(r"^\[(\d+):(\d{2}):(\d{2})\]\s*(.+)$", re.M)
+FAKE_ASSESSMENT = "שפה אמפתית: 3 – (fake server) תשובה קבועה לבדיקה מקומית."
+
+
+def fake_chat_reply(body: dict) -> str:
+    """Deterministic stand-in for GPT-4o: a format-valid merge, or a fixed assessment."""
+    prompt = body["messages"][-1]["content"]
+    if "שפה אמפתית" in prompt and "תמליל:" in prompt:
+        return FAKE_ASSESSMENT
+    if "TRANSCRIPT 1:" in prompt:
+        lines = sorted(
+            ((int(h) * 3600 + int(m) * 60 + int(s), text.strip()) for h, m, s, text in _LINE_RE.findall(prompt)),
+            key=lambda x: x[0],
+        )
+        return "\n".join(
+            f"[{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}] Nurse: {text}" for t, text in lines
+        )
+    return prompt
+
+
+def _usage(req: dict, content: str) -> dict:
+    """Rough 4-chars-per-token estimate, enough for local accounting."""
+    prompt_chars = sum(len(m.get("content", "")) for m in req.get("messages", []))
+    return {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+            "total_tokens": (prompt_chars + len(content)) // 4}
+
+
+def _multipart_file(body: bytes, content_type: str) -> bytes:
+    """Return the bytes of the `file` field of a multipart/form-data body."""
+    m = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if not m:
+        return body
+    boundary = b"--" + m.group(1).encode()
+    for part in body.split(boundary):
+        head, _, payload = part.partition(b"\r\n\r\n")
+        if b'name="file"' in head:
+            return payload.rsplit(b"\r\n", 1)[0]
+    return b""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/0.1"
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse by the client is visible
+
+    def log_message(self, *args):  # keep benchmark output clean
+        pass
+
+    def _reply(self, code: int, body: bytes, content_type: str = "text/plain; charset=utf-8"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        fake: "FakeOpenAI" = self.server.fake
+        with fake.lock:
+            fake.calls += 1
+            fake.connections.add(self.client_address)
+            throttle = fake.throttle_every and fake.calls % fake.throttle_every == 0
+            if throttle:
+                fake.throttled += 1
+        if throttle:
+            self.send_response(429)
+            self.send_header("retry-after-ms", str(int(fake.retry_after_s * 1000)))
+            body = b'{"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}}'
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.endswith("/audio/transcriptions"):
+            payload = _multipart_file(body, self.headers.get("Content-Type", ""))
+            if fake.stt_fn is not None:
+                time.sleep(fake.latency)
+                return self._reply(200, fake.stt_fn(payload).encode("utf-8"))
+            m = _SLEEP_RE.search(payload)
+            time.sleep(float(m.group(1)) if m else fake.latency)
+            return self._reply(200, payload.decode("utf-8", "replace").encode("utf-8"))
+        if self.path.endswith("/chat/completions"):
+            req = json.loads(body or b"{}")
+            time.sleep(fake.latency)
+            content = fake.chat_fn(req)
+            if req.get("stream"):
+                return self._stream(req, content, fake.stream_delay)
+            resp = {
+                "id": f"chatcmpl-fake-{fake.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": req.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": _usage(req, content),
+            }
+            return self._reply(200, json.dumps(resp, ensure_ascii=False).encode("utf-8"), "application/json")
+        self._reply(404, b'{"error": {"message": "not found"}}', "application/json")
+
+
+    def _stream(self, req: dict, content: str, delay: float):
+        """chat.completion.chunk events, a few words at a time, then [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        pieces = re.findall(r"\S+\s*|\s+", content)
+        pieces = ["".join(pieces[i:i + 4]) for i in range(0, len(pieces), 4)] or [""]
+        for piece in pieces:
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": req.get("model", "gpt-4o"),
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+            time.sleep(delay)
+        if (req.get("stream_options") or {}).get("include_usage"):
+            usage = _usage(req, content)
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": req.get("model", "gpt-4o"), "choices": [], "usage": usage}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeOpenAI:
+    """Threaded fake server; use as a context manager to start/stop it."""
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0, chat_fn=fake_chat_reply,
+                 stream_delay: float = 0.0, throttle_every: int = 0, retry_after_s: float = 0.2,
+                 stt_fn=None):
+        self.latency = latency
+        self.stt_fn = stt_fn
+        self.stream_delay = stream_delay  # pause after each streamed chunk
+        self.throttle_every = throttle_every
+        self.retry_after_s = retry_after_s
+        self.throttled = 0
+        self.connections = set()  # (host, port) of every client connection seen
+        self.chat_fn = chat_fn
+        self.calls = 0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the fake OpenAI server in the foreground.")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with a 429")
+    args = ap.parse_args()
+    with FakeOpenAI(latency=args.latency, port=args.port, throttle_every=args.throttle_every) as fake:
+        print(f"fake OpenAI API on {fake.base_url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
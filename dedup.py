@@ -0,0 +1,145 @@
+# dedup.py — near-duplicate filtering for '[H:MM:SS] text' transcript lines (or segments.Segments)
+#
+# Same decisions as the original loops in pipeline.py, but each line is parsed and lowercased
+# once, and Levenshtein is skipped whenever the length ratio alone proves the pair cannot pass:
+# ratio(a, b) = 1 - indel(a, b) / (len(a) + len(b)) and indel(a, b) >= |len(a) - len(b)|,
+# so ratio(a, b) <= 2 * min(len) / (len(a) + len(b)).
+
+from collections import deque
+from typing import Iterable, List, Optional, Sequence
+
+import Levenshtein
+
+_EPS = 1e-9  # keep the bound conservative against float rounding
+
+
+def line_text(line) -> str:
+    """The text part of '[H:MM:SS] text' (the whole line if there is no timestamp)."""
+    line = str(line)
+    return line.split('] ', 1)[1] if '] ' in line else line
+
+
+def _may_pass(n1: int, n2: int, threshold: float) -> bool:
+    """False when the length bound alone rules out ratio > threshold."""
+    total = n1 + n2
+    if total == 0:
+        return True
+    return 2.0 * min(n1, n2) / total > threshold - _EPS
+
+
+def similar(lower1: str, lower2: str, threshold: float) -> bool:
+    """Levenshtein.ratio(lower1, lower2) > threshold, skipping the call when lengths rule it out."""
+    if not _may_pass(len(lower1), len(lower2), threshold):
+        return False
+    return Levenshtein.ratio(lower1, lower2) > threshold
+
+
+def _is_punctuation_only(text: str) -> bool:
+    return text.replace('.', '').replace(',', '').replace('?', '').replace('!', '').strip() == ''
+
+
+def is_valid_segment(text, previous_segments, min_length=3, similarity_threshold=0.8):
+    text = str(text).strip()
+    if len(text) < min_length:
+        return False
+    # punctuation-only
+    if _is_punctuation_only(text):
+        return False
+    lower = text.lower()
+    for prev_text in previous_segments[-5:]:
+        if similar(lower, str(prev_text).lower(), similarity_threshold):
+            return False
+    return True
+
+
+class SegmentFilter:
+    """
+    Streaming version of the per-segment checks in transcribe_chunks: is_valid_segment against the
+    last `window` accepted segments plus the exact-repeat check against the last 3 lines.
+    Accepted segments are remembered already lowercased.
+    """
+
+    def __init__(self, min_length: int = 3, similarity_threshold: float = 0.8, window: int = 5):
+        self.min_length = min_length
+        self.similarity_threshold = similarity_threshold
+        self.window = window
+        self._recent = deque(maxlen=max(window, 3))  # (text, lower)
+
+    def accept(self, text) -> bool:
+        text = str(text).strip()
+        if len(text) < self.min_length or _is_punctuation_only(text):
+            return False
+        lower = text.lower()
+        recent = list(self._recent)
+        for _, prev_lower in recent[-self.window:]:
+            if similar(lower, prev_lower, self.similarity_threshold):
+                return False
+        # avoid exact repetition within last few lines
+        if any(text == prev for prev, _ in recent[-3:]):
+            return False
+        self._recent.append((text, lower))
+        return True
+
+
+def _dedupe_indices(texts: Sequence[str], similarity_threshold: float) -> List[int]:
+    """Rows kept by remove_duplicate_lines, in output order (a row may be replaced by a longer later one)."""
+    kept = [0]
+    parsed = [(texts[0], texts[0].lower())]  # (text, lower) per kept row, parallel to kept
+    for i in range(1, len(texts)):
+        current_text = texts[i]
+        current_lower = current_text.lower()
+        is_duplicate = False
+
+        for j in range(max(0, len(kept) - 3), len(kept)):
+            prev_text, prev_lower = parsed[j]
+
+            if current_text == prev_text:
+                is_duplicate = True
+                break
+
+            if similar(current_lower, prev_lower, similarity_threshold):
+                # keep the longer one (same rule as your script)
+                if len(current_text) > len(prev_text):
+                    kept[j] = i
+                    parsed[j] = (current_text, current_lower)
+                is_duplicate = True
+                break
+
+        if not is_duplicate:
+            kept.append(i)
+            parsed.append((current_text, current_lower))
+    return kept
+
+
+def remove_duplicate_lines(transcript, similarity_threshold=0.85):
+    """Remove duplicate or very similar consecutive lines (preserves your output format)."""
+    if not transcript:
+        return transcript
+    kept = _dedupe_indices([line_text(line) for line in transcript], similarity_threshold)
+    return [transcript[i] for i in kept]
+
+
+def remove_duplicate_segments(segments, similarity_threshold=0.85):
+    """remove_duplicate_lines for a segments.Segments (compares the texts, no line parsing)."""
+    if not len(segments):
+        return segments
+    return segments.take(_dedupe_indices(segments.text, similarity_threshold))
+
+
+def _dedupe_one(args):
+    lines, threshold = args
+    return remove_duplicate_lines(lines, threshold)
+
+
+def remove_duplicate_lines_batch(
+    transcripts: Iterable[Sequence[str]],
+    similarity_threshold: float = 0.85,
+    workers: Optional[int] = None,
+) -> List[List[str]]:
+    """remove_duplicate_lines over many transcripts; workers > 1 spreads them over processes."""
+    jobs = [(list(t), similarity_threshold) for t in transcripts]
+    if not workers or workers <= 1 or len(jobs) < 2:
+        return [_dedupe_one(job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_dedupe_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
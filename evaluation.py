@@ -0,0 +1,272 @@
+# evaluation.py — agreement of the GPT empathy scores with the human ratings (replaces the notebooks)
+#
+#   python evaluation.py                                # sheet's "gpt_empathy score" vs. the human rating
+#   python evaluation.py --results results.jsonl        # scores from a batch_eval.py run instead
+#   python evaluation.py --by Gender "Academic year"    # + per-group summaries (demographics)
+#
+# data/records_informations.xlsx is converted once into a Parquet file under the cache dir (keyed by
+# the spreadsheet's digest, so editing it re-converts); later runs read the Parquet columns only.
+# Scores from results.jsonl are kept in a second Parquet table together with the byte offset read so
+# far: batch_eval.py appends one line per finished session, and each update reads only the new lines.
+# Metrics (MAE, RMSE, exact/within-1 agreement, random/mean/mode baselines and their paired
+# differences) are NumPy reductions over a (resamples, sessions) matrix, so the point estimate and
+# thousands of bootstrap resamples are computed in the same vectorized pass.
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from batch_eval import discover_sessions, reference_merge
+from result_cache import CACHE_DIR, file_digest, make_key
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RECORDS_XLSX = os.environ.get("NEE_RECORDS", os.path.join(HERE, "data", "records_informations.xlsx"))
+EVAL_DIR = os.environ.get("NEE_EVAL_DIR", os.path.join(CACHE_DIR, "evaluation"))
+SHEET = "Sheet1"
+LABEL_COL = "Using compassionate and empathetic language"
+PRED_COL = "gpt_empathy score"
+
+SCALE = (1, 5)
+BOOTSTRAP_RESAMPLES = int(os.environ.get("EVAL_BOOTSTRAP_RESAMPLES", "10000"))
+BOOTSTRAP_SEED = 42  # the notebooks' random-baseline seed
+_BLOCK_CELLS = 2_000_000  # resample rows per pass = _BLOCK_CELLS // sessions (bounds memory)
+
+METRICS = ("mae", "err_std", "rmse", "exact", "within_1",
+           "rmse_random", "rmse_mean", "rmse_mode", "gain_vs_random", "gain_vs_mean", "gain_vs_mode")
+
+
+# --- columnar cache ---
+def _write_parquet(df: pd.DataFrame, path: str, meta: Optional[Dict[str, str]] = None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if meta:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def load_records(xlsx: str = RECORDS_XLSX, sheet: str = SHEET) -> pd.DataFrame:
+    """The participants sheet, one row per session_id (str); read from Excel only once per version."""
+    digest = file_digest(xlsx)[:16]
+    path = os.path.join(EVAL_DIR, f"records-{digest}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    df = pd.read_excel(xlsx, sheet_name=sheet)  # needs openpyxl
+    df = df.dropna(how="all")
+    df.insert(0, "session_id", df.pop("ID").astype("Int64").astype(str))
+    for col in df.columns[1:]:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("string").str.strip()
+    for old in os.listdir(EVAL_DIR) if os.path.isdir(EVAL_DIR) else ():
+        if old.startswith("records-") and old.endswith(".parquet"):
+            os.remove(os.path.join(EVAL_DIR, old))  # superseded spreadsheet version
+    _write_parquet(df, path)
+    return df
+
+
+def _scores_path(results_path: str) -> str:
+    return os.path.join(EVAL_DIR, f"scores-{make_key(os.path.abspath(results_path))[:16]}.parquet")
+
+
+def _head(results_path: str, size: int = 4096) -> str:
+    """Digest of the file's first bytes: tells an appended results file from a replaced one."""
+    with open(results_path, "rb") as f:
+        return make_key(f.read(size).decode("utf-8", "replace"))
+
+
+def update_scores(results_path: str) -> pd.DataFrame:
+    """
+    session_id -> score (NaN for errors / unparsable assessments), the last record per session.
+    Only the lines appended since the previous call are read; a truncated or rewritten results
+    file (different size or first bytes) is read again from the start.
+    """
+    import pyarrow.parquet as pq
+    path = _scores_path(results_path)
+    scores = pd.DataFrame({"session_id": pd.Series(dtype="string"), "score": pd.Series(dtype="float64")})
+    offset, head = 0, ""
+    if os.path.exists(path):
+        table = pq.read_table(path)
+        offset = int(table.schema.metadata.get(b"offset", b"0"))
+        head = table.schema.metadata.get(b"head", b"").decode()
+        scores = table.to_pandas()
+    size = os.path.getsize(results_path) if os.path.exists(results_path) else 0
+    if size < offset or (offset and _head(results_path) != head):
+        scores, offset = scores.iloc[:0], 0
+    if size == offset:
+        return scores
+
+    ids, values = [], []
+    with open(results_path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # a line still being written: read it next time
+            offset += len(raw)
+            try:
+                rec = json.loads(raw)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if rec.get("session_id") is None:
+                continue
+            ids.append(str(rec["session_id"]))
+            score = None if rec.get("error") else rec.get("score")
+            values.append(np.nan if score is None else float(score))
+    new = pd.DataFrame({"session_id": pd.Series(ids, dtype="string"), "score": values})
+    scores = (pd.concat([scores, new], ignore_index=True)
+              .drop_duplicates("session_id", keep="last").reset_index(drop=True))
+    _write_parquet(scores, path, {"offset": str(offset), "head": _head(results_path),
+                                  "results": os.path.abspath(results_path)})
+    return scores
+
+
+def session_outputs(data_dir: str) -> pd.DataFrame:
+    """Per-session outputs under data/: number of angle transcripts and whether a reference merge exists."""
+    sessions = discover_sessions(data_dir)
+    return pd.DataFrame({
+        "session_id": pd.Series(list(sessions), dtype="string"),
+        "angles": [len(paths) for paths in sessions.values()],
+        "has_merge": [reference_merge(data_dir, sid) is not None for sid in sessions],
+    })
+
+
+def evaluation_table(data_dir: str = os.path.join(HERE, "data"), xlsx: str = RECORDS_XLSX,
+                     results_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Records joined with the data/ outputs, plus "label" (human rating) and "pred": the sheet's GPT
+    score, or the batch_eval.py score when results_path is given.
+    """
+    df = load_records(xlsx)
+    df["session_id"] = df["session_id"].astype("string")
+    df = df.merge(session_outputs(data_dir), on="session_id", how="left")
+    df["label"] = pd.to_numeric(df[LABEL_COL], errors="coerce")
+    if results_path:
+        df = df.merge(update_scores(results_path).rename(columns={"score": "pred"}), on="session_id", how="left")
+    else:
+        df["pred"] = pd.to_numeric(df[PRED_COL], errors="coerce")
+    return df
+
+
+# --- metrics ---
+def _metrics(t: np.ndarray, p: np.ndarray, r: np.ndarray) -> Dict[str, np.ndarray]:
+    """Every metric for each row of (resamples, sessions) labels t, predictions p, random guesses r."""
+    err = p - t
+    abs_err = np.abs(err)
+    levels = np.arange(SCALE[0], SCALE[1] + 1, dtype=t.dtype)
+    counts = (t[..., None] == levels).sum(axis=-2)
+    mode = levels[counts.argmax(axis=-1)]  # smallest most frequent rating, like Series.mode().iloc[0]
+    rmse = np.sqrt(np.mean(err ** 2, axis=-1))
+    rmse_random = np.sqrt(np.mean((r - t) ** 2, axis=-1))
+    rmse_mean = t.std(axis=-1)  # RMSE of predicting the (resample's) mean rating
+    rmse_mode = np.sqrt(np.mean((t - mode[:, None]) ** 2, axis=-1))
+    return {
+        "mae": abs_err.mean(axis=-1),
+        "err_std": abs_err.std(axis=-1),
+        "rmse": rmse,
+        "exact": np.mean(abs_err == 0, axis=-1),
+        "within_1": np.mean(abs_err <= 1, axis=-1),
+        "rmse_random": rmse_random,
+        "rmse_mean": rmse_mean,
+        "rmse_mode": rmse_mode,
+        "gain_vs_random": rmse_random - rmse,
+        "gain_vs_mean": rmse_mean - rmse,
+        "gain_vs_mode": rmse_mode - rmse,
+    }
+
+
+def _pairs(y_true, y_pred) -> Tuple[np.ndarray, np.ndarray]:
+    t = np.asarray(y_true, dtype=float)
+    p = np.asarray(y_pred, dtype=float)
+    keep = ~(np.isnan(t) | np.isnan(p))
+    return t[keep], p[keep]
+
+
+def agreement(y_true, y_pred, seed: int = BOOTSTRAP_SEED) -> Dict[str, float]:
+    """Point estimates over the sessions with both ratings (the notebook's random baseline for the seed)."""
+    t, p = _pairs(y_true, y_pred)
+    r = np.random.default_rng(seed).integers(SCALE[0], SCALE[1] + 1, size=len(t))
+    out = {k: float(v[0]) for k, v in _metrics(t[None], p[None], r[None]).items()}
+    out["n"] = len(t)
+    return out
+
+
+def bootstrap(y_true, y_pred, resamples: int = BOOTSTRAP_RESAMPLES, seed: int = BOOTSTRAP_SEED
+              ) -> Dict[str, np.ndarray]:
+    """Every metric over `resamples` session-level resamples (with replacement): {metric: (resamples,)}."""
+    t, p = _pairs(y_true, y_pred)
+    n = len(t)
+    if n == 0:
+        raise ValueError("no sessions with both a human rating and a score")
+    rng = np.random.default_rng(seed)
+    parts = []
+    block = max(1, _BLOCK_CELLS // n)
+    for start in range(0, resamples, block):
+        rows = min(block, resamples - start)
+        idx = rng.integers(0, n, size=(rows, n))
+        guesses = rng.integers(SCALE[0], SCALE[1] + 1, size=(rows, n)).astype(float)
+        parts.append(_metrics(t[idx], p[idx], guesses))
+    return {k: np.concatenate([part[k] for part in parts]) for k in METRICS}
+
+
+def confidence_intervals(y_true, y_pred, resamples: int = BOOTSTRAP_RESAMPLES, level: float = 0.95,
+                         seed: int = BOOTSTRAP_SEED) -> pd.DataFrame:
+    """One row per metric: point estimate and percentile-bootstrap [low, high]."""
+    point = agreement(y_true, y_pred, seed)
+    draws = bootstrap(y_true, y_pred, resamples, seed)
+    tail = (1 - level) / 2 * 100
+    bounds = np.percentile(np.vstack([draws[k] for k in METRICS]), [tail, 100 - tail], axis=1)
+    return pd.DataFrame({"estimate": [point[k] for k in METRICS], "low": bounds[0], "high": bounds[1]},
+                        index=pd.Index(METRICS, name="metric"))
+
+
+def group_summary(df: pd.DataFrame, by: Iterable[str]) -> Dict[str, pd.DataFrame]:
+    """Per column in `by`: sessions, mean/std human rating and MAE of the scores per group."""
+    scored = df.assign(abs_err=(df["pred"] - df["label"]).abs())
+    return {
+        col: scored.groupby(col, dropna=True).agg(
+            n=("label", "count"), label_mean=("label", "mean"), label_std=("label", "std"),
+            mae=("abs_err", "mean"))
+        for col in by
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Agreement of the GPT empathy scores with the human ratings.")
+    ap.add_argument("--data", default=os.path.join(HERE, "data"), help="session directories (data/<id>/)")
+    ap.add_argument("--records", default=RECORDS_XLSX, help="participants spreadsheet")
+    ap.add_argument("--results", help="batch_eval.py results.jsonl (default: the sheet's score column)")
+    ap.add_argument("--resamples", type=int, default=BOOTSTRAP_RESAMPLES)
+    ap.add_argument("--level", type=float, default=0.95, help="confidence level")
+    ap.add_argument("--by", nargs="*", default=[], help="columns to summarise per group, e.g. Gender")
+    ap.add_argument("--json", help="also write the metrics table to this file")
+    args = ap.parse_args(argv)
+
+    df = evaluation_table(args.data, args.records, args.results)
+    try:
+        table = confidence_intervals(df["label"], df["pred"], args.resamples, args.level)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    n = int(df[["label", "pred"]].notna().all(axis=1).sum())
+    source = args.results or f"{PRED_COL!r} column"
+    print(f"{n} of {len(df)} session(s) with a human rating and a score ({source}), "
+          f"{args.resamples} resamples, {args.level:.0%} CI")
+    for metric, row in table.iterrows():
+        print(f"{metric:15s} {row.estimate:6.3f}   [{row.low:6.3f}, {row.high:6.3f}]")
+    for col, summary in group_summary(df, args.by).items():
+        print(f"\n{summary.round(3).to_string()}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(table.to_dict(orient="index"), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
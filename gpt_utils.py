@@ -1,9 +1,16 @@
 # gpt_utils.py — Python 3.8+ safe, OpenAI v1 SDK, forced GPT-4o
 
-from typing import List
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 import re
 
+import tracing
+from openai_client import estimate_tokens, request
+from result_cache import cached, cached_stream, fingerprint
+from premerge import premerge_transcripts
+from windowed_merge import (MERGE_MAX_WORKERS, MERGE_WINDOW_OVERLAP_S, MERGE_WINDOW_S,
+                            iter_stitched, split_windows, stitch_windows)
+
 # === Hebrew Empathy Evaluation (no "חוזקות" wording; requires what lowered/missing) ===
 EMPATHY_PROMPT_TEMPLATE = r"""
 את/ה בוחן/ת איכות תקשורת של סטודנטית לסיעוד בתרגול סימולציה.
@@ -53,12 +60,51 @@ Return only the cleaned and role-tagged transcript in the following format:
 [HH:MM:SS] Role: Sentence
 """.strip()
 
-def _client(api_key: str) -> OpenAI:
-    return OpenAI(api_key=api_key)
+# Added after the preamble when the angles were already interleaved locally (premerge.py)
+PREMERGE_NOTE = """
+Note: the transcripts have already been interleaved by timestamp into ONE transcript, and lines that
+clearly appeared in more than one transcript were collapsed to their longest version. Keep the order,
+merge any remaining duplicates, fix errors, and assign roles as above.
+""".strip()
+
+MERGE_SYSTEM = "You merge transcripts faithfully. Output ONLY the cleaned, role-tagged transcript."
+ASSESS_SYSTEM = "Assess empathetic language concisely. Return exactly ONE line."
+MERGE_PARAMS = dict(model="gpt-4o", temperature=0.1, max_tokens=4000)
+ASSESS_PARAMS = dict(model="gpt-4o", temperature=0.0, max_tokens=600)
+
+# cache versions: editing a template or system message invalidates the cached results built from it
+MERGE_VERSION = fingerprint(PROMPT_PREAMBLE, PREMERGE_NOTE, MERGE_SYSTEM)
+ASSESS_VERSION = fingerprint(EMPATHY_PROMPT_TEMPLATE, ASSESS_SYSTEM)
+
+def _chat(api_key: str, body: dict, stage: str) -> str:
+    """One chat completion on the pooled client, paced by the rate-limit scheduler (openai_client.py)."""
+    with tracing.span(stage, model=body["model"]) as sp:
+        resp = request(api_key, body["model"], lambda c: c.chat.completions.create(**body),
+                       tokens=estimate_tokens(body))
+        tracing.add_usage(sp, resp.usage)
+        return resp.choices[0].message.content
+
+def _stream_chat(api_key: str, body: dict, stage: str) -> Iterator[str]:
+    """Text deltas of a streamed chat completion (the last event carries the token usage)."""
+    with tracing.span(stage, model=body["model"], stream=True) as sp:
+        stream = request(api_key, body["model"],
+                         lambda c: c.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                             **body),
+                         tokens=estimate_tokens(body))
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                tracing.add_usage(sp, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-def _build_merge_prompt(transcripts: List[str]) -> str:
+def _build_merge_prompt(transcripts: List[str], premerge: bool = False) -> str:
     if isinstance(transcripts, str):
         transcripts = [transcripts]
+    if premerge and transcripts:
+        # one time-ordered transcript with cross-angle duplicates collapsed -> far fewer prompt tokens
+        merged = "\n".join(premerge_transcripts(transcripts))
+        return "\n".join([PROMPT_PREAMBLE, "\n" + PREMERGE_NOTE, "\nHere is the pre-merged transcript:",
+                          f"\nTRANSCRIPT 1:\n{merged}\n"])
     parts = [PROMPT_PREAMBLE, "\nHere are the raw transcripts:"]
     if not transcripts:
         parts.append("\n(Empty input — no transcripts provided.)")
@@ -67,39 +113,117 @@ def _build_merge_prompt(transcripts: List[str]) -> str:
             parts.append(f"\nTRANSCRIPT {i}:\n{t}\n")
     return "\n".join(parts)
 
-def combine_transcripts_with_gpt(transcripts, api_key):
-    """
-    Merge multiple transcripts into a single clean, role-tagged transcript (GPT-4o).
-    """
-    prompt = _build_merge_prompt(transcripts)
-    client = _client(api_key)
-    resp = client.chat.completions.create(
-        model="gpt-4o",
+def merge_request_body(transcripts, premerge: bool = False) -> dict:
+    """Chat-completions request body for the merge (also used for Batch API request files)."""
+    return dict(
         messages=[
-            {"role": "system", "content": "You merge transcripts faithfully. Output ONLY the cleaned, role-tagged transcript."},
-            {"role": "user", "content": prompt},
+            {"role": "system", "content": MERGE_SYSTEM},
+            {"role": "user", "content": _build_merge_prompt(transcripts, premerge=premerge)},
         ],
-        temperature=0.1,
-        max_tokens=4000,
+        **MERGE_PARAMS,
     )
-    return resp.choices[0].message.content.strip()
 
-def assess_transcript_quality(final_transcript: str, api_key: str):
-    """
-    Evaluate Hebrew empathetic language (one line) using the template above (GPT-4o).
-    """
-    client = _client(api_key)
-    user_prompt = EMPATHY_PROMPT_TEMPLATE.format(final_transcript=final_transcript)
-    resp = client.chat.completions.create(
-        model="gpt-4o",
+def assessment_request_body(final_transcript: str) -> dict:
+    """Chat-completions request body for the empathy assessment."""
+    return dict(
         messages=[
-            {"role": "system", "content": "Assess empathetic language concisely. Return exactly ONE line."},
-            {"role": "user", "content": user_prompt},
+            {"role": "system", "content": ASSESS_SYSTEM},
+            {"role": "user", "content": EMPATHY_PROMPT_TEMPLATE.format(final_transcript=final_transcript)},
         ],
-        temperature=0.0,
-        max_tokens=600,
+        **ASSESS_PARAMS,
     )
-    text = resp.choices[0].message.content.strip()
+
+def normalize_assessment(text: str) -> str:
     # normalize to one line
-    text = re.sub(r'\s*\n+\s*', ' ', text)
-    return text
+    return re.sub(r'\s*\n+\s*', ' ', text.strip())
+
+def parse_empathy_score(assessment: str):
+    """The 1–5 score from a one-line assessment ('שפה אמפתית: 4 – ...'), or None."""
+    m = re.search(r'[:：]\s*\[?\s*([1-5])(?![0-9])', assessment or "")
+    return int(m.group(1)) if m else None
+
+def combine_transcripts_with_gpt(transcripts, api_key, premerge: bool = False):
+    """
+    Merge multiple transcripts into a single clean, role-tagged transcript (GPT-4o).
+    premerge=True interleaves and de-duplicates the angles locally first (smaller prompt).
+    Results are cached by transcript content (see result_cache.py).
+    """
+    body = merge_request_body(transcripts, premerge=premerge)
+
+    def _merge():
+        return _chat(api_key, body, "merge").strip()
+
+    return cached("merge", (body["messages"][1]["content"], MERGE_PARAMS), _merge, version=MERGE_VERSION)
+
+def stream_combine_transcripts(transcripts, api_key, premerge: bool = False) -> Iterator[str]:
+    """
+    combine_transcripts_with_gpt, yielding the text as GPT-4o produces it.
+    "".join(...).strip() is the same transcript; the cache entry is shared with the blocking call.
+    """
+    body = merge_request_body(transcripts, premerge=premerge)
+    return cached_stream("merge", (body["messages"][1]["content"], MERGE_PARAMS),
+                         lambda: _stream_chat(api_key, body, "merge"), str.strip, version=MERGE_VERSION)
+
+def combine_transcripts_windowed(transcripts, api_key, premerge: bool = False,
+                                 window_s: int = MERGE_WINDOW_S, overlap_s: int = MERGE_WINDOW_OVERLAP_S,
+                                 max_workers: int = MERGE_MAX_WORKERS):
+    """
+    combine_transcripts_with_gpt over overlapping time windows, merged concurrently and stitched
+    (see windowed_merge.py). Latency and output length per call are bounded by the window size,
+    not the session length. A session that fits in one window is merged in a single call.
+    """
+    if isinstance(transcripts, str):
+        transcripts = [transcripts]
+    windows = split_windows(transcripts, window_s, overlap_s)
+    if len(windows) <= 1:
+        return combine_transcripts_with_gpt(transcripts, api_key, premerge=premerge)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        futures = [tracing.submit(pool, combine_transcripts_with_gpt, w[2], api_key, premerge=premerge)
+                   for w in windows]
+        merged = [f.result() for f in futures]
+    return "\n".join(stitch_windows(windows, merged, overlap_s))
+
+def stream_combine_transcripts_windowed(transcripts, api_key, premerge: bool = False,
+                                        window_s: int = MERGE_WINDOW_S, overlap_s: int = MERGE_WINDOW_OVERLAP_S,
+                                        max_workers: int = MERGE_MAX_WORKERS) -> Iterator[str]:
+    """
+    combine_transcripts_windowed, yielding the stitched lines of each window as soon as it and
+    all earlier windows are merged. "".join(...) is the same transcript.
+    """
+    if isinstance(transcripts, str):
+        transcripts = [transcripts]
+    windows = split_windows(transcripts, window_s, overlap_s)
+    if len(windows) <= 1:
+        yield from stream_combine_transcripts(transcripts, api_key, premerge=premerge)
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        futures = [tracing.submit(pool, combine_transcripts_with_gpt, w[2], api_key, premerge=premerge)
+                   for w in windows]
+        try:
+            merged = (f.result() for f in futures)
+            for i, line in enumerate(iter_stitched(windows, merged, overlap_s)):
+                yield line if i == 0 else "\n" + line
+        finally:
+            for f in futures:
+                f.cancel()
+
+def assess_transcript_quality(final_transcript: str, api_key: str):
+    """
+    Evaluate Hebrew empathetic language (one line) using the template above (GPT-4o).
+    Results are cached by transcript content (see result_cache.py).
+    """
+    body = assessment_request_body(final_transcript)
+
+    def _assess():
+        return normalize_assessment(_chat(api_key, body, "assess"))
+
+    return cached("assess", (body["messages"][1]["content"], ASSESS_PARAMS), _assess, version=ASSESS_VERSION)
+
+def stream_assess_transcript_quality(final_transcript: str, api_key: str) -> Iterator[str]:
+    """
+    assess_transcript_quality, yielding the text as it arrives.
+    normalize_assessment("".join(...)) is the same one-line result; the cache entry is shared.
+    """
+    body = assessment_request_body(final_transcript)
+    return cached_stream("assess", (body["messages"][1]["content"], ASSESS_PARAMS),
+                         lambda: _stream_chat(api_key, body, "assess"), normalize_assessment, version=ASSESS_VERSION)
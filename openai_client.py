@@ -0,0 +1,200 @@
+# openai_client.py — one pooled OpenAI client per API key + a rate-limit-aware request scheduler
+#
+# Every STT chunk, merge and assessment goes through request(): the call waits for room in the
+# requests-per-minute / tokens-per-minute budget of its (key, model), runs on the shared client
+# (connections and TLS sessions are reused) and is retried with backoff + jitter on 429, 5xx and
+# connection errors. A 429 pauses the whole budget for its Retry-After, so concurrent sessions
+# back off together instead of hammering the limit. stats() exposes the counters.
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+R = TypeVar("R")
+
+# --- budgets per (key, model), 0 = no limit ---
+# defaults are OpenAI usage tier 2 for gpt-4o; on tier 1 set OPENAI_RPM=500 OPENAI_TPM=30000
+OPENAI_RPM = int(os.environ.get("OPENAI_RPM", "5000"))
+OPENAI_TPM = int(os.environ.get("OPENAI_TPM", "450000"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "5"))
+OPENAI_RETRY_BACKOFF = float(os.environ.get("OPENAI_RETRY_BACKOFF", "1.0"))
+OPENAI_TIMEOUT_S = float(os.environ.get("OPENAI_TIMEOUT", "600"))
+
+COUNTERS = ("queued", "in_flight", "throttled", "retried", "completed", "failed")
+
+_CLIENTS: Dict[Tuple[str, str], Any] = {}
+_SCHEDULERS: Dict[Tuple[str, str], "RequestScheduler"] = {}
+_LOCK = threading.Lock()
+
+
+def get_client(api_key: str):
+    """The shared OpenAI client for api_key (thread-safe; one connection pool per key)."""
+    key = (api_key, os.environ.get("OPENAI_BASE_URL", ""))
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            from openai import OpenAI
+            # retries are done by RequestScheduler, so they are paced and counted
+            client = OpenAI(api_key=api_key, max_retries=0, timeout=OPENAI_TIMEOUT_S)
+            _CLIENTS[key] = client
+        return client
+
+
+def estimate_tokens(body: dict) -> int:
+    """What a chat request counts against TPM: prompt (~3 chars/token for Hebrew) + max_tokens."""
+    chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    return chars // 3 + int(body.get("max_tokens") or 0)
+
+
+class RateLimiter:
+    """Requests and tokens per minute as two continuously refilled buckets (one minute of burst)."""
+
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        dt = now - self._stamp
+        self._stamp = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + dt * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + dt * self.tpm / 60.0)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of `tokens` fits the budget; returns the seconds waited."""
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # an oversized request waits for a full bucket
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+                if wait <= 0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return now - start
+                self._cond.wait(wait)
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (after a 429)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def _classify(exc: BaseException) -> Tuple[bool, bool]:
+    """(retryable, rate_limited) for an exception raised by the SDK."""
+    import openai
+    status = getattr(exc, "status_code", None)
+    if status == 429:
+        return True, True
+    if isinstance(exc, openai.APIConnectionError) or (status is not None and status >= 500):
+        return True, False
+    return False, False
+
+
+def handled_by_scheduler(exc: BaseException) -> bool:
+    """True for API errors: request() already retried whatever was worth retrying."""
+    import openai
+    return isinstance(exc, openai.APIError)
+
+
+class RequestScheduler:
+    """Paces calls through a RateLimiter and retries 429/5xx/connection errors with jitter."""
+
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM,
+                 max_retries: int = OPENAI_MAX_RETRIES, backoff: float = OPENAI_RETRY_BACKOFF):
+        self.limiter = RateLimiter(rpm, tpm)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            self.counters[name] += delta
+
+    def call(self, fn: Callable[[], R], tokens: int = 0) -> R:
+        attempt = 0
+        while True:
+            self._count("queued")
+            try:
+                self.limiter.acquire(tokens)
+            finally:
+                self._count("queued", -1)
+            self._count("in_flight")
+            try:
+                result = fn()
+            except Exception as exc:
+                retryable, rate_limited = _classify(exc)
+                if rate_limited:
+                    self._count("throttled")
+                if not retryable or attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                delay = _retry_after(exc) or self.backoff * (2 ** attempt)
+                delay += random.uniform(0, delay / 2)
+                if rate_limited:
+                    self.limiter.pause(delay)
+                self._count("retried")
+                attempt += 1
+            else:
+                self._count("completed")
+                return result
+            finally:
+                self._count("in_flight", -1)
+            time.sleep(delay)
+
+
+def get_scheduler(api_key: str, model: str) -> RequestScheduler:
+    """The scheduler for (api_key, model): OpenAI limits are per organisation and model."""
+    with _LOCK:
+        sched = _SCHEDULERS.get((api_key, model))
+        if sched is None:
+            sched = _SCHEDULERS[(api_key, model)] = RequestScheduler()
+        return sched
+
+
+def request(api_key: str, model: str, fn: Callable[[Any], R], tokens: int = 0) -> R:
+    """fn(client) on the pooled client for api_key, paced and retried by the (key, model) scheduler."""
+    client = get_client(api_key)
+    return get_scheduler(api_key, model).call(lambda: fn(client), tokens)
+
+
+def stats() -> Dict[str, int]:
+    """Counters summed over all schedulers of this process."""
+    with _LOCK:
+        schedulers = list(_SCHEDULERS.values())
+    total = dict.fromkeys(COUNTERS, 0)
+    for sched in schedulers:
+        with sched._lock:
+            for name, value in sched.counters.items():
+                total[name] += value
+    return total
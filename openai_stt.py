@@ -0,0 +1,139 @@
+# openai_stt.py — OpenAI speech-to-text helpers (gpt-4o-transcribe), no torch/whisper needed
+
+import os
+import time
+import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import IO, Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from alignment import Alignment, session_chunks
+from audio_stream import VAD_ENABLED, AudioChunk, SegmentStats, chunks_for, segmenter_params
+import tracing
+from openai_client import handled_by_scheduler, request
+from result_cache import cached, file_digest
+from segments import Segments
+
+STT_MODEL = "gpt-4o-transcribe"
+
+# --- concurrency settings (override per call or via env) ---
+MAX_WORKERS = int(os.environ.get("STT_MAX_WORKERS", "4"))
+MAX_RETRIES = int(os.environ.get("STT_MAX_RETRIES", "3"))
+RETRY_BACKOFF_S = float(os.environ.get("STT_RETRY_BACKOFF", "1.0"))
+
+C = TypeVar("C")
+
+
+def transcribe_with_openai_single(audio: Union[str, IO[bytes]], api_key: str, model: str = STT_MODEL) -> str:
+    """Transcribe one file path or named file-like object (e.g. AudioChunk.as_wav())."""
+    def _call(client):
+        if not isinstance(audio, str):
+            audio.seek(0)  # a retried upload starts from the beginning again
+            return client.audio.transcriptions.create(model=model, file=audio, response_format="text")
+        with open(audio, "rb") as f:
+            return client.audio.transcriptions.create(
+                model=model,
+                file=f,
+                response_format="text",
+            )
+
+    # SDK returns a plain string for response_format="text"
+    return str(request(api_key, model, _call))
+
+
+def transcribe_audio_chunk(chunk: AudioChunk, api_key: str, model: str = STT_MODEL) -> str:
+    with tracing.span("stt_chunk", model=model) as sp:
+        tracing.add_audio(sp, chunk.duration, len(chunk.pcm), model)
+        return transcribe_with_openai_single(chunk.as_wav(), api_key, model=model)
+
+
+def _call_with_retry(fn: Callable[[C], str], chunk: C, retries: int, backoff: float) -> str:
+    """
+    Run fn(chunk), retrying with exponential backoff + jitter on any error except API errors,
+    which the request scheduler (openai_client.py) has already retried as far as worthwhile.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn(chunk)
+        except Exception as exc:
+            if attempt >= retries or handled_by_scheduler(exc):
+                raise
+            delay = backoff * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay / 2))
+            attempt += 1
+
+
+def transcribe_chunks_concurrently(
+    chunks: Iterable[Tuple[C, int]],
+    transcribe_fn: Callable[[C], str],
+    max_workers: int = MAX_WORKERS,
+    retries: int = MAX_RETRIES,
+    backoff: float = RETRY_BACKOFF_S,
+) -> List[Tuple[int, str]]:
+    """
+    Transcribe (chunk, offset_seconds) pairs on a bounded worker pool.
+    Returns (offset_seconds, text) pairs in offset order, whatever order the chunks finish in.
+    `chunks` may be a lazy iterator: only max_workers + 1 chunks are pulled from it and held at once.
+    A chunk that still fails after `retries` retries raises and cancels the chunks not yet started.
+    """
+    workers = max(1, max_workers)
+    results: List[Tuple[int, str]] = []
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+    try:
+        pending = {}
+        for chunk, offset in chunks:
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results.append((pending.pop(fut), fut.result()))
+            pending[tracing.submit(pool, _call_with_retry, transcribe_fn, chunk, retries, backoff)] = offset
+        for fut in list(pending):
+            results.append((pending.pop(fut), fut.result()))
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown(wait=True)
+    results.sort(key=lambda r: r[0])
+    return results
+
+
+def transcribe_long_with_openai(video_path: str, api_key: str, max_workers: int = MAX_WORKERS,
+                                vad: bool = VAD_ENABLED, stats: Optional[SegmentStats] = None) -> List[str]:
+    """
+    Stream-decode into <=5-minute chunks (long silences skipped when vad=True), transcribe them
+    concurrently -> '[HH:MM:SS] text' lines. Pass a SegmentStats to see how much audio was skipped
+    (it stays empty when the result comes from the cache).
+    """
+    key = (file_digest(video_path), "openai", STT_MODEL, segmenter_params(vad))
+    return cached("stt", key, lambda: _transcribe_long(video_path, api_key, max_workers, vad, stats))
+
+
+def _transcribe_long(video_path: str, api_key: str, max_workers: int, vad: bool,
+                     stats: Optional[SegmentStats]) -> List[str]:
+    return _transcribe_chunks(chunks_for(video_path, vad=vad, stats=stats), api_key, max_workers)
+
+
+def transcribe_session_with_openai(paths: Sequence[str], alignment: Alignment, api_key: str,
+                                   max_workers: int = MAX_WORKERS, vad: bool = VAD_ENABLED,
+                                   stats: Optional[SegmentStats] = None) -> List[str]:
+    """
+    Like transcribe_long_with_openai(), but for all angles of one session at once: only the
+    clearest angle per window (alignment.align_session) is sent, so the session is transcribed
+    once. Timestamps are on the common timeline (the earliest recording starts at 0).
+    """
+    key = ([file_digest(p) for p in paths], "openai-aligned", STT_MODEL, alignment.to_dict(), segmenter_params(vad))
+    return cached("stt", key, lambda: _transcribe_chunks(
+        session_chunks(paths, alignment, vad=vad, stats=stats), api_key, max_workers))
+
+
+def _transcribe_chunks(chunks: Iterable[AudioChunk], api_key: str, max_workers: int) -> List[str]:
+    results = transcribe_chunks_concurrently(
+        ((chunk, chunk.offset) for chunk in chunks),
+        lambda chunk: transcribe_audio_chunk(chunk, api_key),
+        max_workers=max_workers,
+    )
+    segments = Segments()
+    for start_sec, txt in results:
+        for sent in [s.strip() for s in txt.replace("\r"," ").split("\n") if s.strip()]:
+            segments.append(start_sec, sent)
+    return segments.format_lines(pad=True)
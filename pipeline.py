@@ -1,197 +1,221 @@
 # pipeline.py
 
 import os
-import tempfile
-import subprocess
-from datetime import timedelta
+import sys
+import threading
+from collections import OrderedDict
 
-import whisper
-import torch
-from pydub import AudioSegment
-import Levenshtein
+# whisper and torch are imported on first use (stt_backends.load_backend), not with this module:
+# the OpenAI engine never needs them
+
+# near-duplicate filtering lives in dedup.py; is_valid_segment / remove_duplicate_lines were defined
+# here and are re-exported, unused in this module, for existing callers
+from dedup import SegmentFilter, is_valid_segment, remove_duplicate_lines, remove_duplicate_segments  # noqa: F401
+from segments import Segments, format_stamp
 
 
 # --- add to pipeline.py ---
-from openai import OpenAI
 import re
-
-def _transcribe_chunk_openai(chunk_path: str, api_key: str, model: str = "gpt-4o-transcribe") -> str:
-    client = OpenAI(api_key=api_key)
-    with open(chunk_path, "rb") as f:
-        resp = client.audio.transcriptions.create(
-            model=model,      # or "gpt-4o-mini-transcribe"
-            file=f,
-            response_format="text"
-        )
-    # SDK returns a plain string for response_format="text"
-    return str(resp)
-
-def pipeline_for_video_openai(video_path: str, api_key: str, model: str = "gpt-4o-transcribe"):
-    audio_path = extract_audio(video_path)
-    try:
-        chunks = split_audio(audio_path)  # you already return (path, offset_seconds)
-        lines = []
-        for chunk_path, offset in chunks:
-            text = _transcribe_chunk_openai(chunk_path, api_key, model=model)
-            # slap coarse timestamps on sentences so your UI stays the same shape
-            for sent in filter(None, [s.strip() for s in re.split(r'(?<=[.!?])\s+', text)]):
-                lines.append(f"[{format_time(offset)}] {sent}")
-        # optionally reuse your duplicate cleaner
-        return remove_duplicate_lines(lines)
-    finally:
-        try: os.remove(audio_path)
-        except Exception: pass
+import tracing
+from openai_stt import (transcribe_audio_chunk, transcribe_with_openai_single,
+                        transcribe_chunks_concurrently, MAX_WORKERS)
+from audio_stream import VAD_ENABLED, AudioChunk, chunks_for, segmenter_params
+from alignment import session_chunks
+from stt_backends import DEFAULT_BACKEND, get_backend
+from stt_backends import LANGUAGE  # noqa: F401  (was defined here; re-exported for existing callers)
+from result_cache import cached, file_digest
+
+def _transcribe_chunk_openai(chunk_path, api_key: str, model: str = "gpt-4o-transcribe") -> str:
+    # or model="gpt-4o-mini-transcribe"
+    return transcribe_with_openai_single(chunk_path, api_key, model=model)
+
+def pipeline_for_video_openai(video_path: str, api_key: str, model: str = "gpt-4o-transcribe",
+                              max_workers: int = MAX_WORKERS, vad: bool = VAD_ENABLED, stats=None):
+    key = (file_digest(video_path), "openai-sentences", model, segmenter_params(vad))
+    return cached("stt", key, lambda: _pipeline_for_video_openai(video_path, api_key, model, max_workers, vad, stats))
+
+
+def _pipeline_for_video_openai(video_path, api_key, model, max_workers, vad, stats):
+    # one ffmpeg pass, in-memory WAV chunks uploaded concurrently; results come back in offset order
+    results = transcribe_chunks_concurrently(
+        ((chunk, chunk.offset) for chunk in chunks_for(video_path, vad=vad, stats=stats)),
+        lambda chunk: transcribe_audio_chunk(chunk, api_key, model=model),
+        max_workers=max_workers,
+    )
+    segments = Segments()
+    for offset, text in results:
+        # slap coarse timestamps on sentences so your UI stays the same shape
+        for sent in filter(None, [s.strip() for s in re.split(r'(?<=[.!?])\s+', text)]):
+            segments.append(offset, sent)
+    # optionally reuse your duplicate cleaner
+    return remove_duplicate_segments(segments).format_lines()
 
 
 # --- Settings to mirror your original script ---
-LANGUAGE = "he"
 DEFAULT_MODEL = "large"           # same default as your working script
 CHUNK_LENGTH_MS = 5 * 60 * 1000   # 5 minutes
 
-
-def extract_audio(video_path: str) -> str:
-    """Extract audio to a temp mp3 using ffmpeg (raises with stderr if it fails)."""
-    tmp = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-    tmp.close()
-    audio_output_path = tmp.name
-
-    result = subprocess.run(
-        ["ffmpeg", "-y", "-i", video_path, "-vn", "-acodec", "mp3", audio_output_path],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    if result.returncode != 0:
-        raise RuntimeError(f"Audio extraction failed.\n\nffmpeg stderr:\n{result.stderr}")
-    return audio_output_path
-
-
-def split_audio(audio_path: str, chunk_length_ms: int = CHUNK_LENGTH_MS):
-    audio = AudioSegment.from_file(audio_path)
-    chunks = []
-    for i in range(0, len(audio), chunk_length_ms):
-        chunk = audio[i:i + chunk_length_ms]
-        temp_chunk = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-        chunk.export(temp_chunk.name, format="mp3")
-        chunks.append((temp_chunk.name, i // 1000))  # store offset in seconds
-    return chunks
+# decoding kwargs (LANGUAGE, WHISPER_DECODE_OPTIONS) live in stt_backends.py, shared by every engine
+
+# uploads are processed concurrently (ffmpeg decoding + VAD included), but one model call at a time:
+# decoding installs kv-cache hooks on the (shared) model and holds the GPU
+_TRANSCRIBE_LOCK = threading.Lock()
+
+# --- process-wide Whisper model cache ---
+# each (model_name, device) is loaded once per process and shared by all files/sessions/reruns;
+# least-recently-used models are dropped once their weights exceed the cap. faster-whisper models
+# (stt_backends.py) live in the same cache under their own keys, so the cap covers both engines.
+WHISPER_CACHE_MAX_BYTES = int(float(os.environ.get("WHISPER_CACHE_MAX_GB", "8")) * 1024 ** 3)
+_MODELS = OrderedDict()   # key -> (model, n_bytes), oldest first
+_MODELS_LOCK = threading.Lock()
+_LOAD_LOCKS = {}          # key -> Lock, so one load per key at a time
+_WARMUPS = {}             # (model_name, device) -> warm-up thread
+
+
+def _default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _model_nbytes(model) -> int:
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def _evict_models(max_bytes: int):
+    """Drop LRU models until the cache fits (the most recent one is always kept). Caller holds _MODELS_LOCK."""
+    evicted = False
+    while len(_MODELS) > 1 and sum(n for _, n in _MODELS.values()) > max_bytes:
+        _MODELS.popitem(last=False)
+        evicted = True
+    if evicted and "torch" in sys.modules:  # faster-whisper-only processes never import torch
+        _empty_cuda_cache()
+
+
+def _empty_cuda_cache():
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def get_whisper_model(model_name: str = DEFAULT_MODEL, device: str = None):
+    """Return a shared Whisper model, loading it on first use."""
+    key = (model_name, device or _default_device())
+
+    def load():
+        import whisper
+        return whisper.load_model(key[0], device=key[1])
+
+    return get_shared_model(key, load, _model_nbytes)
+
+
+def get_shared_model(key, load, nbytes):
+    """Return the model cached under `key`, loading it with load() on first use (nbytes(model) counts toward the cap)."""
+    with _MODELS_LOCK:
+        if key in _MODELS:
+            _MODELS.move_to_end(key)
+            return _MODELS[key][0]
+        load_lock = _LOAD_LOCKS.setdefault(key, threading.Lock())
+    with load_lock:
+        # another session may have finished loading while we waited
+        with _MODELS_LOCK:
+            if key in _MODELS:
+                _MODELS.move_to_end(key)
+                return _MODELS[key][0]
+        model = load()
+        with _MODELS_LOCK:
+            _MODELS[key] = (model, nbytes(model))
+            _evict_models(WHISPER_CACHE_MAX_BYTES)
+    return model
+
+
+def warm_up_whisper(model_name: str = DEFAULT_MODEL, device: str = None, background: bool = True):
+    """Preload a model at startup. With background=True it loads on a daemon thread (started once per process)."""
+    if not background:
+        return get_whisper_model(model_name, device)
+    key = (model_name, device or _default_device())
+    with _MODELS_LOCK:
+        thread = _WARMUPS.get(key)
+        if thread is None:
+            thread = threading.Thread(target=get_whisper_model, args=key, daemon=True, name="whisper-warmup")
+            _WARMUPS[key] = thread
+            thread.start()
+    return thread
+
+
+def clear_whisper_cache():
+    with _MODELS_LOCK:
+        _MODELS.clear()
+        _WARMUPS.clear()
+    if "torch" in sys.modules:  # nothing to free if no model was ever loaded
+        _empty_cuda_cache()
 
 
 def format_time(seconds: float) -> str:
-    return str(timedelta(seconds=int(seconds)))
-
-
-def is_valid_segment(text, previous_segments, min_length=3, similarity_threshold=0.8):
-    text = str(text).strip()
-    if len(text) < min_length:
-        return False
-    # punctuation-only
-    if text.replace('.', '').replace(',', '').replace('?', '').replace('!', '').strip() == '':
-        return False
-    for prev_text in previous_segments[-5:]:
-        prev_text = str(prev_text)
-        similarity = Levenshtein.ratio(text.lower(), prev_text.lower())
-        if similarity > similarity_threshold:
-            return False
-    return True
+    return format_stamp(seconds)
 
 
-def transcribe_chunks(chunks, model_name: str = DEFAULT_MODEL):
-    # keep behavior but avoid fp16 crash on CPU
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = whisper.load_model(model_name, device=device)
-    use_fp16 = (device == "cuda")
+def transcribe_chunks(chunks, model_name: str = DEFAULT_MODEL, backend: str = DEFAULT_BACKEND):
+    # the engine (openai-whisper, faster-whisper, ...) only has to return whisper-style segments
+    engine = get_backend(backend, model_name)
+    device = engine.device
 
-    transcript = []
-    recent_segments = []
+    transcript = Segments()
+    segment_filter = SegmentFilter()
 
     for chunk_path, offset in chunks:
-        result = model.transcribe(
-            chunk_path,
-            language=LANGUAGE,
-            word_timestamps=True,
-            condition_on_previous_text=False,
-            temperature=0.0,
-            beam_size=5,
-            best_of=5,
-            patience=1.0,
-            no_speech_threshold=0.6,
-            suppress_blank=True,
-            fp16=use_fp16,
-            verbose=False,
-            compression_ratio_threshold=2.4,
-            logprob_threshold=-1.0,
-        )
-
-        for segment in result.get("segments", []):
+        # streamed chunks are decoded PCM already; whisper takes the float array directly
+        audio = chunk_path.as_array() if isinstance(chunk_path, AudioChunk) else chunk_path
+        # only the model call is serialized; the span starts once the lock is held (no queueing time)
+        with _TRANSCRIBE_LOCK, tracing.span("whisper_chunk", model=model_name, device=device,
+                                            backend=engine.name) as sp:
+            if isinstance(chunk_path, AudioChunk):
+                tracing.add_audio(sp, chunk_path.duration, len(chunk_path.pcm))
+            segments = engine.transcribe(audio)
+
+        for segment in segments:
             text = str(segment.get("text", "")).strip()
-            if not is_valid_segment(text, recent_segments):
+            # is_valid_segment vs. recent segments + no exact repeat of the last few lines
+            if not segment_filter.accept(text):
                 continue
-            # avoid exact repetition within last few lines
-            if text in [str(line.split('] ', 1)[1]) for line in transcript[-3:] if '] ' in line]:
-                continue
-
-            start_time = format_time(segment['start'] + offset)
-            line = f"[{start_time}] {text}"
-            transcript.append(line)
-            recent_segments.append(text)
-
-            if len(recent_segments) > 10:
-                recent_segments.pop(0)
-
-    return remove_duplicate_lines(transcript)
-
-
-def remove_duplicate_lines(transcript, similarity_threshold=0.85):
-    """Remove duplicate or very similar consecutive lines (preserves your output format)."""
-    if not transcript:
-        return transcript
-
-    cleaned_transcript = [transcript[0]]
-    for i in range(1, len(transcript)):
-        current_line = transcript[i]
-        current_text = str(current_line.split('] ', 1)[1] if '] ' in current_line else current_line)
-        is_duplicate = False
-
-        for j in range(max(0, len(cleaned_transcript) - 3), len(cleaned_transcript)):
-            prev_line = cleaned_transcript[j]
-            prev_text = str(prev_line.split('] ', 1)[1] if '] ' in prev_line else prev_line)
-
-            if current_text == prev_text:
-                is_duplicate = True
-                break
-
-            similarity = Levenshtein.ratio(current_text.lower(), prev_text.lower())
-            if similarity > similarity_threshold:
-                # keep the longer one (same rule as your script)
-                if len(current_text) > len(prev_text):
-                    cleaned_transcript[j] = current_line
-                is_duplicate = True
-                break
 
-        if not is_duplicate:
-            cleaned_transcript.append(current_line)
+            # VAD chunks have silence cut out: map back to the original timeline
+            if isinstance(chunk_path, AudioChunk):
+                start, end = chunk_path.to_original(segment['start']), chunk_path.to_original(segment['end'])
+            else:
+                start, end = segment['start'] + offset, segment['end'] + offset
+            transcript.append(start, text, end=end)
 
-    return cleaned_transcript
+    return remove_duplicate_segments(transcript).format_lines()
 
 
-def pipeline_for_video(video_path: str, model_name: str = DEFAULT_MODEL):
+def pipeline_for_video(video_path: str, model_name: str = DEFAULT_MODEL, vad: bool = VAD_ENABLED, stats=None,
+                       backend: str = DEFAULT_BACKEND):
     """Main entry: returns list of lines like '[HH:MM:SS] text' (same as your script)."""
-    audio_path = extract_audio(video_path)
-    try:
-        chunks = split_audio(audio_path)
-        try:
-            transcript_lines = transcribe_chunks(chunks, model_name=model_name)
-            return transcript_lines
-        finally:
-            # cleanup chunk files
-            for chunk_path, _ in chunks:
-                try:
-                    os.remove(chunk_path)
-                except Exception:
-                    pass
-    finally:
-        try:
-            os.remove(audio_path)
-        except Exception:
-            pass
+    chunk_length_s = CHUNK_LENGTH_MS // 1000
+    key = (file_digest(video_path), *get_backend(backend, model_name).cache_key(),
+           segmenter_params(vad, chunk_length_s))
+
+    def _run():
+        # single ffmpeg pass, chunks stay in memory (no temp mp3s); long silences skipped when vad=True
+        chunks = ((chunk, chunk.offset)
+                  for chunk in chunks_for(video_path, vad=vad, stats=stats, chunk_length_s=chunk_length_s))
+        # the generator decodes outside the lock; transcribe_chunks locks each model call
+        return transcribe_chunks(chunks, model_name=model_name, backend=backend)
+
+    return cached("stt", key, _run)
+
+
+def pipeline_for_session(paths, alignment, model_name: str = DEFAULT_MODEL, vad: bool = VAD_ENABLED, stats=None,
+                         backend: str = DEFAULT_BACKEND):
+    """pipeline_for_video() for all angles of one session: the clearest angle per window, transcribed once."""
+    chunk_length_s = CHUNK_LENGTH_MS // 1000
+    key = ([file_digest(p) for p in paths], "aligned", *get_backend(backend, model_name).cache_key(),
+           alignment.to_dict(), segmenter_params(vad, chunk_length_s))
+
+    def _run():
+        chunks = ((chunk, chunk.offset)
+                  for chunk in session_chunks(paths, alignment, vad=vad, stats=stats, chunk_length_s=chunk_length_s))
+        # the generator decodes outside the lock; transcribe_chunks locks each model call
+        return transcribe_chunks(chunks, model_name=model_name, backend=backend)
+
+    return cached("stt", key, _run)
@@ -0,0 +1,72 @@
+# premerge.py — deterministic local pre-merge of multi-angle transcripts
+#
+# Runs before combine_transcripts_with_gpt: the per-angle segments (segments.py) are k-way merged
+# by timestamp and cross-angle near-duplicates inside a short time window are collapsed (keeping
+# the longest variant). GPT-4o then gets one interleaved transcript instead of N overlapping ones
+# and only has to assign roles and clean up.
+
+import re
+from typing import List, Sequence, Tuple
+
+from dedup import similar
+from segments import Segments, as_segments, merge_sorted
+
+PREMERGE_WINDOW_S = 8          # cross-angle duplicates are at most this far apart
+PREMERGE_SIMILARITY = 0.6      # looser than dedup.py: different mics mishear differently
+MIN_CONTAINED_CHARS = 4        # a fragment this long found inside another variant is a duplicate...
+MIN_CONTAINED_RATIO = 0.5      # ...if it covers this much of it and starts/ends on word boundaries
+
+
+def parse_transcript(transcript: str) -> List[Tuple[int, str]]:
+    """(seconds, text) per line; lines without a timestamp inherit the previous one."""
+    segs = Segments.parse(transcript)
+    return [(int(sec), text) for sec, text in zip(segs.start, segs.text)]
+
+
+def _is_duplicate(lower: str, other: str, threshold: float) -> bool:
+    short, long_ = (lower, other) if len(lower) <= len(other) else (other, lower)
+    # a cut-off variant of the same utterance, not a short reply ("כן, בסדר") that another line happens to contain
+    if (len(short) >= MIN_CONTAINED_CHARS and len(short) >= MIN_CONTAINED_RATIO * len(long_)
+            and short in long_ and re.search(r"(?<!\w)" + re.escape(short) + r"(?!\w)", long_)):
+        return True
+    return similar(lower, other, threshold)
+
+
+def premerge_segments(
+    transcripts: Sequence,
+    window_s: int = PREMERGE_WINDOW_S,
+    similarity_threshold: float = PREMERGE_SIMILARITY,
+) -> Segments:
+    """Merge per-angle transcripts (strings or Segments) into one time-ordered Segments."""
+    # each source sorted by time (stable), then a k-way merge on (time, source, position)
+    sources = [s.sorted() for s in as_segments(transcripts)]
+    kept = []  # [sec, sources, src, row, lower]
+    for sec, src, i in merge_sorted(sources):
+        text = sources[src].text[i]
+        lower = text.lower()
+        duplicate = False
+        k = len(kept) - 1
+        while k >= 0 and kept[k][0] >= sec - window_s:
+            entry = kept[k]
+            if src not in entry[1] and _is_duplicate(lower, entry[4], similarity_threshold):
+                entry[1].add(src)
+                if len(text) > len(sources[entry[2]].text[entry[3]]):  # keep the longest variant
+                    entry[2], entry[3], entry[4] = src, i, lower
+                duplicate = True
+                break
+            k -= 1
+        if not duplicate:
+            kept.append([sec, {src}, src, i, lower])
+    out = Segments()
+    for sec, _, src, i, _ in kept:
+        out.append(sec, sources[src].text[i], source=src)
+    return out
+
+
+def premerge_transcripts(
+    transcripts: Sequence,
+    window_s: int = PREMERGE_WINDOW_S,
+    similarity_threshold: float = PREMERGE_SIMILARITY,
+) -> List[str]:
+    """Merge per-angle transcripts into one time-ordered list of '[H:MM:SS] text' lines."""
+    return premerge_segments(transcripts, window_s, similarity_threshold).format_lines(pad=False)
@@ -0,0 +1,267 @@
+# result_cache.py — content-addressed on-disk cache for transcripts, merges and assessments
+#
+# Keys are hashes of the inputs (audio bytes / transcript text) plus everything that changes the
+# output (engine, model, decoding kwargs). Entries live under <kind>/<version>/, where `version`
+# fingerprints the prompt templates: when a template changes, the old version dirs are deleted.
+#
+#   python result_cache.py info               # size per kind
+#   python result_cache.py clear [--kind stt]  # explicit invalidation (every user's entries)
+#
+# The cache directory is shared by every session of the app: `with recording(keys):` collects the
+# entries one session reads or writes, so the app can remove just those (ResultCache.remove).
+
+import argparse
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Callable, Iterator, Optional, Set, Tuple
+
+CACHE_ENABLED = os.environ.get("NEE_CACHE", "1") != "0"
+CACHE_DIR = os.environ.get(
+    "NEE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "nursing-empathy-evaluation")
+)
+CACHE_MAX_MB = float(os.environ.get("NEE_CACHE_MAX_MB", "512"))
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Stable hash of JSON-able key parts (dicts are key-sorted)."""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def fingerprint(*templates: str) -> str:
+    """Short version tag for a set of prompt templates."""
+    return make_key(*templates)[:16]
+
+
+class ResultCache:
+    """JSON values on disk, one file per entry, LRU-by-mtime eviction above max_bytes."""
+
+    def __init__(self, root: str = CACHE_DIR, max_mb: float = CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._checked_versions = set()
+        self._total: Optional[int] = None  # running estimate of the bytes on disk (None: not scanned yet)
+
+    def _path(self, kind: str, key: str, version: str) -> str:
+        return os.path.join(self.root, kind, version or "_", key[:2], key + ".json")
+
+    def _drop_stale_versions(self, kind: str, version: str):
+        """Delete entries written under any other template version of this kind (once per process)."""
+        tag = (kind, version or "_")
+        if tag in self._checked_versions:
+            return
+        self._checked_versions.add(tag)
+        kind_dir = os.path.join(self.root, kind)
+        if not os.path.isdir(kind_dir):
+            return
+        for name in os.listdir(kind_dir):
+            if name != tag[1]:
+                shutil.rmtree(os.path.join(kind_dir, name), ignore_errors=True)
+
+    def get(self, kind: str, key: str, version: str = "") -> Optional[Any]:
+        self._drop_stale_versions(kind, version)
+        path = self._path(kind, key, version)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value["value"]
+
+    def put(self, kind: str, key: str, value: Any, version: str = ""):
+        self._drop_stale_versions(kind, version)
+        path = self._path(kind, key, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"value": value}, f, ensure_ascii=False)
+        size = os.path.getsize(tmp)
+        try:
+            size -= os.path.getsize(path)  # overwriting an entry
+        except OSError:
+            pass
+        os.replace(tmp, path)  # atomic: concurrent sessions never see half an entry
+        self._grew(size)
+
+    def get_or_compute(self, kind: str, key: str, compute: Callable[[], Any], version: str = "") -> Any:
+        hit = self.get(kind, key, version)
+        if hit is not None:
+            return hit
+        value = compute()
+        self.put(kind, key, value, version)
+        return value
+
+    def _entries(self, kind: Optional[str] = None):
+        base = os.path.join(self.root, kind) if kind else self.root
+        for dirpath, _, files in os.walk(base):
+            for name in files:
+                if name.endswith(".json"):
+                    p = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    yield p, st.st_size, st.st_mtime
+
+    def _grew(self, delta: int):
+        """Account for a write; the tree is only walked (and evicted) when the estimate crosses the cap."""
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+                if self._total <= self.max_bytes:
+                    return
+            self._evict()
+
+    def _evict(self):
+        # caller holds self._lock; the walk also corrects the estimate (other processes write here too)
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for p, size, _ in sorted(entries, key=lambda e: e[2]):
+                try:
+                    os.remove(p)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._total = total
+
+    def remove(self, entries: Set[Tuple[str, str, str]]) -> int:
+        """Remove the given (kind, version, key) entries (see recording()). Returns the number removed."""
+        n = freed = 0
+        for kind, version, key in entries:
+            path = self._path(kind, key, version)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            n += 1
+            freed += size
+        with self._lock:
+            if self._total is not None:
+                self._total -= freed
+        return n
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """Remove all entries (or all of one kind). Returns the number of entries removed."""
+        n = sum(1 for _ in self._entries(kind))
+        target = os.path.join(self.root, kind) if kind else self.root
+        shutil.rmtree(target, ignore_errors=True)
+        self._checked_versions.clear()
+        with self._lock:
+            self._total = None
+        return n
+
+    def info(self):
+        """{kind: (entries, bytes)}"""
+        out = {}
+        if os.path.isdir(self.root):
+            for kind in sorted(os.listdir(self.root)):
+                entries = list(self._entries(kind))
+                out[kind] = (len(entries), sum(size for _, size, _ in entries))
+        return out
+
+
+_default: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ResultCache()
+        return _default
+
+
+# entries touched in the current context (copied into worker threads by tracing.submit)
+_recording: contextvars.ContextVar = contextvars.ContextVar("nee_cache_keys", default=None)
+
+
+@contextlib.contextmanager
+def recording(keys: Set[Tuple[str, str, str]]):
+    """Add the (kind, version, key) of every entry read or written inside the block to `keys`."""
+    token = _recording.set(keys)
+    try:
+        yield keys
+    finally:
+        _recording.reset(token)
+
+
+def _note(kind: str, key: str, version: str):
+    keys = _recording.get()
+    if keys is not None:
+        keys.add((kind, version, key))
+
+
+def cached(kind: str, key_parts: tuple, compute: Callable[[], Any], version: str = "") -> Any:
+    """Return the cached result for key_parts, computing and storing it on a miss (no-op if NEE_CACHE=0)."""
+    if not CACHE_ENABLED:
+        return compute()
+    key = make_key(*key_parts)
+    _note(kind, key, version)
+    return get_cache().get_or_compute(kind, key, compute, version)
+
+
+def cached_stream(kind: str, key_parts: tuple, stream: Callable[[], Iterator[str]],
+                  finalize: Callable[[str], str], version: str = "") -> Iterator[str]:
+    """
+    Streaming counterpart of cached(): yields the text pieces of stream() as they arrive and stores
+    finalize("".join(pieces)) once it is exhausted. A hit yields the stored value in one piece.
+    """
+    if not CACHE_ENABLED:
+        yield from stream()
+        return
+    cache, key = get_cache(), make_key(*key_parts)
+    _note(kind, key, version)
+    hit = cache.get(kind, key, version)
+    if hit is not None:
+        yield hit
+        return
+    pieces = []
+    for piece in stream():
+        pieces.append(piece)
+        yield piece
+    cache.put(kind, key, finalize("".join(pieces)), version)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or clear the transcript/merge/assessment cache.")
+    ap.add_argument("command", choices=["info", "clear"])
+    ap.add_argument("--kind", help="only this kind (stt, merge, assess)")
+    ap.add_argument("--dir", default=CACHE_DIR)
+    args = ap.parse_args()
+
+    cache = ResultCache(args.dir)
+    if args.command == "clear":
+        n = cache.invalidate(args.kind)
+        print(f"removed {n} entr{'y' if n == 1 else 'ies'} from {args.dir}")
+    else:
+        print(args.dir)
+        for kind, (n, size) in cache.info().items():
+            print(f"  {kind:8s} {n:6d} entries  {size / 1024 / 1024:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
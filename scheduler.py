@@ -0,0 +1,35 @@
+# scheduler.py — run every file of a session at the same time, report each as it finishes
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, Optional, Sequence, Tuple, TypeVar
+
+import tracing
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# one worker per upload by default (a session is usually 3 camera/mic angles)
+SESSION_MAX_FILES = int(os.environ.get("SESSION_MAX_FILES", "8"))
+
+
+def run_session(
+    items: Sequence[T],
+    fn: Callable[[T], R],
+    max_workers: int = SESSION_MAX_FILES,
+) -> Iterator[Tuple[int, Optional[R], Optional[BaseException]]]:
+    """
+    Run fn(item) for all items concurrently.
+    Yields (index, result, error) in completion order; exactly one of result/error is set.
+    The generator ends when the last item finishes, so callers can chain the next stage right after.
+    UI updates (e.g. Streamlit) must stay in the caller's thread — only fn runs in the workers.
+    """
+    if not items:
+        return
+    workers = max(1, min(max_workers, len(items)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session") as pool:
+        futures = {tracing.submit(pool, fn, item): i for i, item in enumerate(items)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            err = fut.exception()
+            yield i, (None if err else fut.result()), err
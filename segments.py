@@ -0,0 +1,258 @@
+# segments.py — compact structured transcript segments with a sorted time index
+#
+#   segs = Segments.parse(text, source=0)                 # '[H:MM:SS] text' lines (STT output)
+#   segs = Segments.parse(merged, roles=True)             # '[HH:MM:SS] Role: Sentence' (merge output)
+#   segs.format_lines() / str(segs)                       # back to lines, each stamp as it was parsed
+#   segs.format_lines(pad=False)                          # every line '[H:MM:SS] text' ('[HH:MM:SS]': pad=True)
+#   part = segs.sorted().between(60, 240)                 # range query on the time index (bisect)
+#
+# A transcript is parsed once into columns — start/end seconds (array 'd'), source angle (array
+# 'H'), role code (array 'B'), stamp style (array 'B': '[H:MM:SS]', '[HH:MM:SS]' or no stamp) and
+# the text without its timestamp/role prefix (list) — instead of a list of strings that premerge,
+# windowing, dedup and stitching each re-split. Iterating yields Segment rows (__slots__).
+# parse() fills only start, stamp and text: end, source and role are constant for a parsed
+# transcript (no end times, one angle, no roles unless roles=True) and built on first access.
+# By default a row is written back with the stamp style it was parsed with, so a line round-trips
+# except for whitespace around the stamp and role, role capitalisation, and blank or stamp-only
+# lines (which are dropped). Rows added with append() default to '[H:MM:SS]'.
+
+import heapq
+import math
+import operator
+import re
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+ROLES = ("", "Nurse", "Patient", "Nurse (OOC)", "Patient (OOC)")
+_ROLE_CODES = {r.lower(): i for i, r in enumerate(ROLES)}
+ROLE_RE = re.compile(r"^(Nurse|Patient)(\s*\(OOC\))?\s*:\s*", re.I)
+STAMP_RE = re.compile(r"\[(\d+):(\d{1,2}):(\d{1,2})\]\s*")
+_STAMPED_LINE_RE = re.compile(r"\[(\d+):(\d{1,2}):(\d{1,2})\]\s*(.*)", re.S)  # + the rest, in one groups()
+_NUMBERS = {**{str(i): i for i in range(100)}, **{f"{i:02d}": i for i in range(10)}}  # '7'/'07' -> 7, cheaper than int()
+
+NO_END = math.nan  # transcript lines only carry a start time
+
+# stamp style per row: how line() writes the start time when no pad is forced
+STAMP_PLAIN, STAMP_PAD, STAMP_NONE = 0, 1, 2  # '[0:01:02] ', '[00:01:02] ', no stamp (continuation line)
+
+
+def format_stamp(seconds: float, pad: bool = False) -> str:
+    """'0:01:02' (timedelta style, as pipeline.py/premerge.py write) or '00:01:02' with pad=True."""
+    seconds = int(seconds)
+    if pad:
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return str(timedelta(seconds=seconds))
+
+
+def parse_stamp(line: str) -> Optional[Tuple[int, str]]:
+    """(seconds, rest) for a line starting with '[H:MM:SS]' (M and S one or two digits), else None."""
+    m = STAMP_RE.match(line)
+    if m is None:
+        return None
+    return int(m[1]) * 3600 + int(m[2]) * 60 + int(m[3]), line[m.end():]
+
+
+def parse_role(text: str) -> Tuple[int, str]:
+    """(role code, sentence) for 'Role: sentence'; code 0 (no role) if there is no known role prefix."""
+    m = ROLE_RE.match(text)
+    if not m:
+        return 0, text
+    role = m.group(1).capitalize() + (" (OOC)" if m.group(2) else "")
+    return _ROLE_CODES[role.lower()], text[m.end():]
+
+
+def _line(start: float, role: str, text: str, stamp: int, pad: Optional[bool]) -> str:
+    prefix = f"{role}: " if role else ""
+    if pad is None:
+        if stamp == STAMP_NONE:
+            return prefix + text
+        pad = stamp == STAMP_PAD
+    return f"[{format_stamp(start, pad)}] {prefix}{text}"
+
+
+class Segment:
+    """One transcript segment (a row of Segments)."""
+
+    __slots__ = ("start", "end", "source", "role", "text", "stamp")
+
+    def __init__(self, start: float, text: str, end: float = NO_END, source: int = 0, role: str = "",
+                 stamp: int = STAMP_PLAIN):
+        self.start = start
+        self.end = end
+        self.source = source
+        self.role = role
+        self.text = text
+        self.stamp = stamp
+
+    def to_line(self, pad: Optional[bool] = None) -> str:
+        return _line(self.start, self.role, self.text, self.stamp, pad)
+
+    def __repr__(self) -> str:
+        return f"Segment({self.start!r}, {self.text!r}, source={self.source}, role={self.role!r})"
+
+
+class Segments:
+    """Column-stored transcript segments; see the module comment."""
+
+    __slots__ = ("start", "_end", "_source", "_role", "stamp", "text", "_sorted")
+
+    def __init__(self):
+        self.start = array("d")
+        self._end: Optional[array] = array("d")         # None: every row NO_END
+        self._source: Union[array, int] = array("H")    # int: every row from that source
+        self._role: Optional[array] = array("B")        # None: every row without a role
+        self.stamp = array("B")
+        self.text: List[str] = []
+        self._sorted = True
+
+    # --- lazily built columns ---
+    @property
+    def end(self) -> array:
+        if self._end is None:
+            self._end = array("d", [NO_END]) * len(self.text)
+        return self._end
+
+    @property
+    def source(self) -> array:
+        if isinstance(self._source, int):
+            self._source = array("H", [self._source]) * len(self.text)
+        return self._source
+
+    @property
+    def role(self) -> array:
+        if self._role is None:
+            self._role = array("B", bytes(len(self.text)))
+        return self._role
+
+    def _row(self, i: int) -> tuple:
+        """(start, text, end, source, role code, stamp) of row i, without building lazy columns."""
+        source = self._source
+        return (self.start[i], self.text[i], NO_END if self._end is None else self._end[i],
+                source if isinstance(source, int) else source[i], 0 if self._role is None else self._role[i],
+                self.stamp[i])
+
+    # --- building ---
+    def append(self, start: float, text: str, end: float = NO_END, source: int = 0, role: Union[int, str] = 0,
+               stamp: int = STAMP_PLAIN):
+        if self._sorted and self.start and start < self.start[-1]:
+            self._sorted = False
+        self.start.append(start)
+        self.end.append(end)
+        self.source.append(source)
+        self.role.append(role if isinstance(role, int) else _ROLE_CODES[role.lower()])
+        self.stamp.append(stamp)
+        self.text.append(text)
+
+    @classmethod
+    def parse(cls, transcript: Union[str, Iterable[str]], source: int = 0, roles: bool = False) -> "Segments":
+        """
+        Parse '[H:MM:SS] text' lines (a string or an iterable of lines). Lines without a timestamp
+        inherit the previous one; empty lines are skipped. roles=True also splits 'Role: ' prefixes.
+        """
+        lines = transcript.splitlines() if isinstance(transcript, str) else map(str, transcript)
+        starts: List[float] = []
+        texts: List[str] = []
+        codes: List[int] = []
+        stamps = bytearray()
+        match = _STAMPED_LINE_RE.match
+        num = _NUMBERS
+        last = 0
+        for raw in lines:  # the hot loop of loading data/: no per-line function calls or array appends
+            raw = raw.strip()
+            if not raw:
+                continue
+            if raw[0] == "[" and (m := match(raw)) is not None:  # continuation lines skip the regex
+                h, mi, sec, raw = m.groups()
+                last = (num[h] if len(h) < 3 else int(h)) * 3600 + num[mi] * 60 + num[sec]
+                if not raw:
+                    continue
+                stamps.append(STAMP_PAD if len(h) > 1 else STAMP_PLAIN)
+            else:
+                stamps.append(STAMP_NONE)
+            if roles:
+                code, raw = parse_role(raw)
+                codes.append(code)
+            starts.append(last)
+            texts.append(raw)
+        segs = cls()
+        segs.start = array("d", starts)
+        segs._end = None
+        segs._source = source
+        segs._role = array("B", codes) if roles else None
+        segs.stamp = array("B", stamps)
+        segs.text = texts
+        segs._sorted = all(map(operator.le, starts, starts[1:]))
+        return segs
+
+    # --- serializing ---
+    def line(self, i: int, pad: Optional[bool] = None) -> str:
+        """Row i as a line: its parsed stamp style, or every row stamped '[H:MM:SS]'/'[HH:MM:SS]' by pad."""
+        start, text, _, _, role, stamp = self._row(i)
+        return _line(start, ROLES[role], text, stamp, pad)
+
+    def format_lines(self, pad: Optional[bool] = None) -> List[str]:
+        if self._role is None:
+            return [_line(s, "", t, st, pad) for s, t, st in zip(self.start, self.text, self.stamp)]
+        return [_line(s, ROLES[r], t, st, pad) for s, r, t, st in zip(self.start, self._role, self.text, self.stamp)]
+
+    def __str__(self) -> str:
+        return "\n".join(self.format_lines())
+
+    # --- access ---
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __getitem__(self, i: int) -> Segment:
+        start, text, end, source, role, stamp = self._row(i)
+        return Segment(start, text, end, source, ROLES[role], stamp)
+
+    def __iter__(self) -> Iterator[Segment]:
+        for i in range(len(self.text)):
+            yield self[i]
+
+    def take(self, indices: Iterable[int]) -> "Segments":
+        """The rows at `indices`, in that order."""
+        out = Segments()
+        for i in indices:
+            out.append(*self._row(i))
+        return out
+
+    # --- time index ---
+    @property
+    def is_sorted(self) -> bool:
+        return self._sorted
+
+    def sorted(self) -> "Segments":
+        """Rows in start-time order (stable); self if already sorted."""
+        if self._sorted:
+            return self
+        return self.take(sorted(range(len(self.text)), key=self.start.__getitem__))
+
+    def between(self, lo: float, hi: float) -> "Segments":
+        """Rows with lo <= start < hi (binary search; the rows must be sorted)."""
+        if not self._sorted:
+            raise ValueError("between() needs sorted segments (call .sorted() first)")
+        return self.take(range(bisect_left(self.start, lo), bisect_left(self.start, hi)))
+
+    @property
+    def last_start(self) -> float:
+        return max(self.start) if self.start else 0
+
+
+def merge_sorted(sources: Sequence[Segments]) -> Iterator[Tuple[float, int, int]]:
+    """k-way merge of several sorted Segments: (start, source index, row) in (start, source, row) order."""
+    return heapq.merge(*(_keys(s, src) for src, s in enumerate(sources)))
+
+
+def _keys(segs: Segments, src: int) -> Iterator[Tuple[float, int, int]]:
+    for i, start in enumerate(segs.start):
+        yield start, src, i
+
+
+def as_segments(transcripts: Union[str, Segments, Sequence[Union[str, Segments]]]) -> List[Segments]:
+    """Parse what is not parsed yet: one Segments per angle (source = position)."""
+    if isinstance(transcripts, (str, Segments)):
+        transcripts = [transcripts]
+    return [t if isinstance(t, Segments) else Segments.parse(t, source=i) for i, t in enumerate(transcripts)]
@@ -0,0 +1,218 @@
+# stt_backends.py — local speech-to-text engines behind one interface
+#
+#   backend = get_backend("faster-whisper", "large")
+#   segments = backend.transcribe(audio)   # float32 16 kHz mono -> [{"start", "end", "text"}, ...]
+#
+# pipeline.transcribe_chunks() only sees whisper-style segment dicts, so SegmentFilter /
+# is_valid_segment / remove_duplicate_lines work the same for every engine.
+#   openai-whisper  – the original PyTorch path (fp16 on GPU, fp32 on CPU)
+#   faster-whisper  – CTranslate2 with int8 weights on CPU, STT_CPU_THREADS threads; the 30 s
+#                     windows of a chunk are decoded FASTER_WHISPER_BATCH_SIZE at a time
+#
+# Models of both engines share pipeline.py's model cache (and its WHISPER_CACHE_MAX_GB cap).
+#
+# Backends are a registry: a backend's heavy packages (torch, whisper, ctranslate2) are imported
+# the first time it is selected (load_backend / get_backend), never at app startup, and the import
+# time is recorded (import_times(), "backend_import" trace span). available() checks without importing.
+
+import importlib
+import importlib.util
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple, Type
+
+import tracing
+
+FASTER_WHISPER_COMPUTE_TYPE = os.environ.get("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+FASTER_WHISPER_DEVICE = os.environ.get("FASTER_WHISPER_DEVICE", "cpu")
+FASTER_WHISPER_BATCH_SIZE = int(os.environ.get("FASTER_WHISPER_BATCH_SIZE", "8"))  # 1 = sequential decoding
+STT_CPU_THREADS = int(os.environ.get("STT_CPU_THREADS", "0")) or (os.cpu_count() or 4)
+
+DEFAULT_BACKEND = "openai-whisper"
+
+LANGUAGE = "he"
+
+# openai-whisper decoding kwargs (fp16 is picked per device); part of the result-cache key
+WHISPER_DECODE_OPTIONS = dict(
+    language=LANGUAGE,
+    word_timestamps=True,
+    condition_on_previous_text=False,
+    temperature=0.0,
+    beam_size=5,
+    best_of=5,
+    patience=1.0,
+    no_speech_threshold=0.6,
+    suppress_blank=True,
+    verbose=False,
+    compression_ratio_threshold=2.4,
+    logprob_threshold=-1.0,
+)
+
+
+class SttBackend(ABC):
+    """A local STT engine: one model + decoding settings -> whisper-style segments."""
+
+    name = ""
+    requires: Tuple[str, ...] = ()  # heavy modules, imported by load_backend()
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    @abstractmethod
+    def device(self) -> str:
+        """Where the model runs ("cpu" / "cuda")."""
+
+    @abstractmethod
+    def cache_key(self) -> Tuple:
+        """Everything that changes the output (part of the result-cache key)."""
+
+    @abstractmethod
+    def transcribe(self, audio) -> List[Dict]:
+        """Segments ({"start", "end", "text"}, seconds from the start of `audio`)."""
+
+
+class WhisperBackend(SttBackend):
+    """openai-whisper through pipeline.py's shared model cache."""
+
+    name = "openai-whisper"
+    requires = ("torch", "whisper")
+
+    @property
+    def device(self) -> str:
+        from pipeline import _default_device
+        return _default_device()
+
+    def cache_key(self) -> Tuple:
+        return ("whisper", self.model_name, self.device, WHISPER_DECODE_OPTIONS)
+
+    def transcribe(self, audio) -> List[Dict]:
+        from pipeline import get_whisper_model
+        device = self.device
+        model = get_whisper_model(self.model_name, device=device)
+        result = model.transcribe(audio, fp16=(device == "cuda"), **WHISPER_DECODE_OPTIONS)
+        return result.get("segments", [])
+
+
+# --- faster-whisper ---
+FW_WINDOW_S = 30  # Whisper's input window; batched decoding runs one window per batch row
+
+
+def _clips(audio) -> List[Dict]:
+    """Consecutive FW_WINDOW_S windows over `audio` (seconds), the batched counterpart of sequential decoding."""
+    duration = len(audio) / 16000
+    return [{"start": float(i * FW_WINDOW_S), "end": float(min((i + 1) * FW_WINDOW_S, duration))}
+            for i in range(max(1, math.ceil(duration / FW_WINDOW_S)))]
+
+
+def _ct2_nbytes(model_name: str, compute_type: str) -> int:
+    """Weights in memory, estimated from model.bin (float16 on disk; int8 halves it, float32 doubles it)."""
+    from faster_whisper.utils import download_model
+    try:
+        path = model_name if os.path.isdir(model_name) else download_model(model_name, local_files_only=True)
+        size = os.path.getsize(os.path.join(path, "model.bin"))
+    except Exception:  # unknown size: counted as 0, never forces an eviction
+        return 0
+    if compute_type.startswith("int8"):
+        return size // 2
+    return size * 2 if compute_type == "float32" else size
+
+
+def _faster_whisper_options() -> Dict:
+    """WHISPER_DECODE_OPTIONS in faster-whisper's names (same beam search and fallbacks)."""
+    opts = {k: v for k, v in WHISPER_DECODE_OPTIONS.items() if k != "verbose"}
+    opts["log_prob_threshold"] = opts.pop("logprob_threshold")
+    return opts
+
+
+class FasterWhisperBackend(SttBackend):
+    """faster-whisper (CTranslate2), int8 on CPU by default."""
+
+    name = "faster-whisper"
+    requires = ("faster_whisper",)
+
+    def __init__(self, model_name: str, compute_type: str = FASTER_WHISPER_COMPUTE_TYPE,
+                 threads: int = STT_CPU_THREADS, batch_size: int = FASTER_WHISPER_BATCH_SIZE):
+        super().__init__(model_name)
+        self.compute_type = compute_type
+        self.threads = threads
+        self.batch_size = batch_size
+
+    @property
+    def device(self) -> str:
+        return FASTER_WHISPER_DEVICE
+
+    def cache_key(self) -> Tuple:
+        # thread count does not change the output; batching does (it decodes 30 s windows independently)
+        return ("faster-whisper", self.model_name, self.device, self.compute_type, self.batch_size,
+                FW_WINDOW_S if self.batch_size > 1 else None, _faster_whisper_options())
+
+    def model(self):
+        """(WhisperModel, BatchedInferencePipeline), loaded once per process in pipeline.py's model cache."""
+        from pipeline import get_shared_model
+
+        def load():
+            from faster_whisper import BatchedInferencePipeline, WhisperModel
+            model = WhisperModel(self.model_name, device=self.device, compute_type=self.compute_type,
+                                 cpu_threads=self.threads)
+            return model, BatchedInferencePipeline(model=model)
+
+        key = ("faster-whisper", self.model_name, self.device, self.compute_type, self.threads)
+        return get_shared_model(key, load, lambda _: _ct2_nbytes(self.model_name, self.compute_type))
+
+    def transcribe(self, audio) -> List[Dict]:
+        model, batched = self.model()
+        opts = _faster_whisper_options()
+        if self.batch_size > 1:
+            # the chunk is already VAD-trimmed (audio_stream.py): no second VAD, the same audio as the
+            # sequential path, cut into 30 s windows that are decoded batch_size at a time
+            segments, _ = batched.transcribe(audio, batch_size=self.batch_size, vad_filter=False,
+                                             clip_timestamps=_clips(audio), **opts)
+        else:
+            segments, _ = model.transcribe(audio, **opts)
+        # the generator does the decoding; the dicts match openai-whisper's segments
+        return [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+
+
+# --- registry ---
+BACKENDS: Dict[str, Type[SttBackend]] = {b.name: b for b in (WhisperBackend, FasterWhisperBackend)}
+_IMPORT_SECONDS: Dict[str, float] = {}   # backend -> seconds its first import took
+_IMPORT_LOCK = threading.Lock()
+
+
+def _backend_class(name: str) -> Type[SttBackend]:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown STT backend {name!r} (choose from {', '.join(BACKENDS)})") from None
+
+
+def available(name: str) -> bool:
+    """True if the backend's packages are installed (found without importing them)."""
+    return all(importlib.util.find_spec(m) is not None for m in _backend_class(name).requires)
+
+
+def load_backend(name: str) -> Type[SttBackend]:
+    """The backend class; its packages are imported (and timed) the first time it is selected."""
+    cls = _backend_class(name)
+    with _IMPORT_LOCK:
+        if name not in _IMPORT_SECONDS:
+            with tracing.span("backend_import", backend=name):
+                start = time.perf_counter()
+                for module in cls.requires:
+                    importlib.import_module(module)  # ImportError: stays unloaded, retried next time
+                _IMPORT_SECONDS[name] = time.perf_counter() - start
+    return cls
+
+
+def import_times() -> Dict[str, float]:
+    """Seconds each backend loaded so far in this process took to import."""
+    with _IMPORT_LOCK:
+        return dict(_IMPORT_SECONDS)
+
+
+def get_backend(name: str = DEFAULT_BACKEND, model_name: str = "large") -> SttBackend:
+    return load_backend(name)(model_name)
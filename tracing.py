@@ -0,0 +1,179 @@
+# tracing.py — per-session timing / volume / token / cost spans
+#
+#   with tracing.session("upload") as trace:      # app.py / batch_eval.py
+#       ...
+#       with tracing.span("merge", model="gpt-4o") as sp:
+#           resp = ...
+#           tracing.add_usage(sp, resp.usage)
+#   trace.to_dict()   # structured JSON: every span + per-stage totals
+#
+# The current trace lives in a contextvar; worker threads see it when their task is submitted
+# with tracing.submit(). With NEE_TRACE=0, or outside a session, span() is a shared no-op and
+# nothing is recorded.
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+TRACE_ENABLED = os.environ.get("NEE_TRACE", "1") != "0"
+TRACE_DIR = os.environ.get("NEE_TRACE_DIR", "")  # write one JSON file per session here if set
+
+# USD list prices: (input, output) per 1M tokens for chat models, per audio minute for STT
+CHAT_PRICES = {"gpt-4o": (2.50, 10.00)}
+STT_PRICE_PER_MIN = {"gpt-4o-transcribe": 0.006, "gpt-4o-mini-transcribe": 0.003}
+
+SUMMED = ("bytes", "audio_s", "prompt_tokens", "completion_tokens", "cost_usd")
+
+_current: contextvars.ContextVar = contextvars.ContextVar("nee_trace", default=None)
+
+
+class Trace:
+    """Spans of one session (thread-safe append)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._t0 = time.perf_counter()
+        self.wall_s = 0.0
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start: float, seconds: float, attrs: Dict[str, Any]):
+        span = {"stage": stage, "start_s": round(start - self._t0, 4), "seconds": round(seconds, 4),
+                "thread": threading.current_thread().name}
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+    def stages(self) -> Dict[str, Dict[str, float]]:
+        """Totals per stage: calls, seconds (summed over threads) and the summed attributes."""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = out.setdefault(span["stage"], {"calls": 0, "seconds": 0.0})
+            row["calls"] += 1
+            row["seconds"] += span["seconds"]
+            for k in SUMMED:
+                if k in span:
+                    row[k] = row.get(k, 0) + span[k]
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        stages = self.stages()
+        return {
+            "session": self.name,
+            "started": self.started,
+            "wall_s": round(self.wall_s, 4),
+            "cost_usd": round(sum(s.get("cost_usd", 0) for s in stages.values()), 6),
+            "stages": stages,
+            "spans": list(self.spans),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+
+class _NoopSpan:
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def current() -> Optional[Trace]:
+    return _current.get() if TRACE_ENABLED else None
+
+
+@contextmanager
+def session(name: str) -> Iterator[Optional[Trace]]:
+    """Collect the spans of everything run inside the block (and tasks submitted from it)."""
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(name)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.wall_s = time.perf_counter() - trace._t0
+        _current.reset(token)
+        if TRACE_DIR:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            with open(os.path.join(TRACE_DIR, f"{name}-{stamp}.json"), "w", encoding="utf-8") as f:
+                f.write(trace.to_json())
+
+
+@contextmanager
+def _span(trace: Trace, stage: str, attrs: Dict[str, Any]):
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        trace.add(stage, start, time.perf_counter() - start, attrs)
+
+
+def span(stage: str, **attrs):
+    """Time a block; the yielded dict can be filled with bytes, audio_s, tokens, ... inside it."""
+    trace = current()
+    if trace is None:
+        return _NOOP
+    return _span(trace, stage, attrs)
+
+
+def timed_iter(stage: str, items: Iterable, attrs_fn: Callable[[Any], Dict[str, Any]]) -> Iterable:
+    """Pass items through, recording one span per item for the time spent producing it."""
+    trace = current()
+    if trace is None:
+        return items
+    return _timed_iter(trace, stage, iter(items), attrs_fn)
+
+
+def _timed_iter(trace: Trace, stage: str, it: Iterator, attrs_fn) -> Iterator:
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        trace.add(stage, start, time.perf_counter() - start, attrs_fn(item))
+        yield item
+
+
+def submit(pool, fn: Callable, *args, **kwargs):
+    """pool.submit() that runs fn inside the caller's context (its trace, result_cache.recording)."""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def add_usage(attrs: Dict[str, Any], usage, model: str = ""):
+    """Copy prompt/completion tokens (and their list-price cost) from an SDK usage object."""
+    if usage is None or current() is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    attrs["prompt_tokens"] = attrs.get("prompt_tokens", 0) + prompt
+    attrs["completion_tokens"] = attrs.get("completion_tokens", 0) + completion
+    price_in, price_out = CHAT_PRICES.get(model or attrs.get("model", ""), (0.0, 0.0))
+    attrs["cost_usd"] = attrs.get("cost_usd", 0) + (prompt * price_in + completion * price_out) / 1e6
+
+
+def add_audio(attrs: Dict[str, Any], seconds: float, nbytes: int = 0, model: str = ""):
+    """Audio seconds/bytes sent to an STT call (and their list-price cost)."""
+    if current() is None:
+        return
+    attrs["audio_s"] = attrs.get("audio_s", 0) + seconds
+    if nbytes:
+        attrs["bytes"] = attrs.get("bytes", 0) + nbytes
+    per_min = STT_PRICE_PER_MIN.get(model or attrs.get("model", ""), 0.0)
+    if per_min:
+        attrs["cost_usd"] = attrs.get("cost_usd", 0) + seconds / 60 * per_min
@@ -0,0 +1,109 @@
+# windowed_merge.py — split a session into overlapping time windows and stitch the merged windows
+#
+# A single merge call grows with the session and is capped by max_tokens, so long simulations get
+# cut off. Here the raw angle transcripts are cut into windows of MERGE_WINDOW_S seconds that
+# overlap by MERGE_WINDOW_OVERLAP_S; gpt_utils.combine_transcripts_windowed merges the windows
+# concurrently and stitch_windows joins the '[HH:MM:SS] Role: Sentence' outputs. Each window owns
+# the time up to the middle of its overlap with the next one, and lines right after a seam that
+# the previous window already produced (GPT may shift a timestamp by a few seconds) are dropped.
+
+import math
+import os
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from dedup import similar
+from segments import Segments, as_segments, parse_role, parse_stamp
+
+MERGE_WINDOW_S = int(os.environ.get("MERGE_WINDOW_S", "180"))
+MERGE_WINDOW_OVERLAP_S = int(os.environ.get("MERGE_WINDOW_OVERLAP_S", "30"))
+MERGE_MAX_WORKERS = int(os.environ.get("MERGE_MAX_WORKERS", "4"))
+STITCH_SIMILARITY = 0.8
+
+Window = Tuple[int, int, List[Segments]]  # (start_s, end_s, per-angle excerpts)
+
+
+def split_windows(
+    transcripts: Sequence[str],
+    window_s: int = MERGE_WINDOW_S,
+    overlap_s: int = MERGE_WINDOW_OVERLAP_S,
+) -> List[Window]:
+    """Overlapping [start, end) windows covering the session; empty windows are skipped."""
+    if overlap_s >= window_s:
+        raise ValueError("window overlap must be shorter than the window")
+    # parsed once and time-indexed; each window is two binary searches per angle
+    parsed = [s.sorted() for s in as_segments(transcripts)]
+    last = max((p.last_start for p in parsed), default=0)
+    step = window_s - overlap_s
+    windows = []
+    start = 0
+    while True:
+        end = start + window_s
+        parts = [part for part in (p.between(start, end) for p in parsed) if len(part)]
+        if parts:
+            windows.append((start, end, parts))
+        if end > last:
+            return windows
+        start += step
+
+
+def _parse_merged(merged: str) -> List[Tuple[int, str, str]]:
+    """
+    (seconds, line, sentence) per output line: lines without a timestamp inherit the previous one;
+    sentence is the text without timestamp and role, lowercased (what the seam check compares).
+    """
+    out = []
+    last = 0
+    for line in str(merged).splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        stamped = parse_stamp(line)
+        if stamped is not None:
+            last, text = stamped
+        else:
+            text = line
+        out.append((last, line, parse_role(text)[1].strip().lower()))
+    return out
+
+
+def iter_stitched(
+    windows: Sequence[Window],
+    merged: Iterable[str],
+    overlap_s: int = MERGE_WINDOW_OVERLAP_S,
+    similarity_threshold: float = STITCH_SIMILARITY,
+) -> Iterator[str]:
+    """
+    Join per-window merge outputs (same order as `windows`) line by line. `merged` may be lazy:
+    the lines of window i are yielded as soon as its output is available.
+    """
+    half = overlap_s / 2
+    out: List[Tuple[int, str]] = []  # (sec, sentence) of the lines yielded so far
+    for idx, ((start, _, _), text) in enumerate(zip(windows, merged)):
+        lo = start + half if idx > 0 else -math.inf
+        hi = windows[idx + 1][0] + half if idx + 1 < len(windows) else math.inf
+        seam = len(out)  # lines before this index came from earlier windows
+        for sec, line, sentence in _parse_merged(text):
+            if not lo <= sec < hi:
+                continue
+            if sec < lo + half and sentence:
+                k = seam - 1
+                duplicate = False
+                while k >= 0 and out[k][0] >= lo - overlap_s:
+                    if sentence == out[k][1] or similar(sentence, out[k][1], similarity_threshold):
+                        duplicate = True
+                        break
+                    k -= 1
+                if duplicate:
+                    continue
+            out.append((sec, sentence))
+            yield line
+
+
+def stitch_windows(
+    windows: Sequence[Window],
+    merged: Sequence[str],
+    overlap_s: int = MERGE_WINDOW_OVERLAP_S,
+    similarity_threshold: float = STITCH_SIMILARITY,
+) -> List[str]:
+    """Join per-window merge outputs (same order as `windows`) into one list of lines."""
+    return list(iter_stitched(windows, merged, overlap_s, similarity_threshold))